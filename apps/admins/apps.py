@@ -3,3 +3,10 @@ from django.apps import AppConfig
 class AdminsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.admins'
+
+    def ready(self):
+        from apps.admins.services.model_warmup import should_warm_up_on_startup, warm_up_models
+
+        # Preload model AI khi worker khởi động (MODEL_WARMUP_ON_STARTUP)
+        if should_warm_up_on_startup():
+            warm_up_models()
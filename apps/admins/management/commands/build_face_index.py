@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.admins.services.face_index import CampusFaceIndex
+
+
+class Command(BaseCommand):
+    help = ("Build lại index ANN embedding khuôn mặt của toàn trường "
+            "(FaceEmbeddingService.search), gộp các cập nhật trong delta.log")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nlist', type=int, default=None,
+                            help="Số list IVF (mặc định ~4 * sqrt(số vector))")
+        parser.add_argument('--dtype', choices=('float32', 'float16'), default=None,
+                            help="Kiểu lưu vector (mặc định settings.FACE_INDEX_DTYPE)")
+        parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                            help="Đo latency và recall@k trên N vector có sẵn sau khi build")
+        parser.add_argument('--k', type=int, default=5)
+
+    def handle(self, *args, **options):
+        face_index = CampusFaceIndex()
+        start = time.perf_counter()
+        index = face_index.build(nlist=options['nlist'], dtype=options['dtype'])
+        self.stdout.write(
+            f"Index: {len(index)} vectors, {index.nlist} lists, "
+            f"{time.perf_counter() - start:.1f} s -> {face_index.directory}"
+        )
+
+        if options['benchmark'] and len(index):
+            self._benchmark(face_index, options['benchmark'], options['k'])
+
+    def _benchmark(self, face_index, n_queries, k):
+        user_ids, vectors = CampusFaceIndex.load_embeddings()
+        picks = np.random.default_rng(0).choice(len(user_ids), min(n_queries, len(user_ids)), replace=False)
+
+        latencies, recall = [], 0.0
+        for i in picks:
+            query = vectors[i]
+            begin = time.perf_counter()
+            results = face_index.search(query, k)
+            latencies.append(time.perf_counter() - begin)
+
+            exact = user_ids[np.argsort(-(vectors @ query))[:k]]
+            recall += len({user_id for user_id, _ in results} & set(exact.tolist())) / len(exact)
+
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(
+            f"Search k={k}, nprobe={face_index.nprobe}, {len(picks)} queries: "
+            f"p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, "
+            f"recall@{k} {recall / len(picks):.3f}"
+        )
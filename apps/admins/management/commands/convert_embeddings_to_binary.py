@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.admins.services.face_embedding_service import FaceEmbeddingService
+from apps.my_built_in.models.tai_khoan import TaiKhoan
+
+
+class Command(BaseCommand):
+    help = "Chuyển vector_embedding (JSON) sang vector_embedding_bin (float32/float16)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dtype', choices=('float32', 'float16'), default=None,
+            help="dtype lưu vector (mặc định settings.FACE_EMBEDDING_DTYPE)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Số tài khoản cập nhật mỗi transaction"
+        )
+        parser.add_argument(
+            '--overwrite', action='store_true',
+            help="Ghi đè cả tài khoản đã có vector_embedding_bin"
+        )
+        parser.add_argument(
+            '--clear-json', action='store_true',
+            help="Xoá cột JSON sau khi chuyển thành công"
+        )
+
+    def handle(self, *args, **options):
+        users = TaiKhoan.objects.exclude(vector_embedding__isnull=True).exclude(vector_embedding='')
+        if not options['overwrite']:
+            users = users.filter(vector_embedding_bin__isnull=True)
+
+        fields = ['vector_embedding_bin'] + (['vector_embedding'] if options['clear_json'] else [])
+        converted, failed = 0, 0
+        batch = []
+
+        for user in users.only('id', 'vector_embedding', 'vector_embedding_bin').iterator():
+            vector = FaceEmbeddingService.string_to_vector(user.vector_embedding)
+            if vector is None or len(vector) != 512:
+                failed += 1
+                self.stderr.write(f"Bỏ qua tài khoản {user.id}: vector_embedding không hợp lệ")
+                continue
+
+            user.vector_embedding_bin = FaceEmbeddingService.vector_to_bytes(vector, options['dtype'])
+            if options['clear_json']:
+                user.vector_embedding = None
+            batch.append(user)
+
+            if len(batch) >= options['batch_size']:
+                converted += self._save(batch, fields)
+                batch = []
+
+        converted += self._save(batch, fields)
+        self.stdout.write(self.style.SUCCESS(f"Đã chuyển {converted} embedding, lỗi {failed}"))
+
+    @staticmethod
+    def _save(batch, fields):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            TaiKhoan.objects.bulk_update(batch, fields)
+        return len(batch)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.admins.services.core import export
+from apps.admins.services.core.detection.detec import FaceDetector
+from apps.admins.services.core.recognition.rec import FaceRecognition
+
+
+class Command(BaseCommand):
+    help = ("Export RetinaFace và GhostFaceNet sang TorchScript / ONNX "
+            "(dùng với FACE_MODEL_BACKEND=torchscript|onnx)")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', action='append', choices=['torchscript', 'onnx'],
+            help="Định dạng export (lặp lại được, mặc định cả hai)"
+        )
+
+    def handle(self, *args, **options):
+        formats = options['format'] or ['torchscript', 'onnx']
+
+        for name, paths in (
+            ('Detector', export.export_detector(FaceDetector(device='cpu'), formats)),
+            ('Recognizer', export.export_recognizer(FaceRecognition(device='cpu'), formats)),
+        ):
+            for fmt, path in paths.items():
+                self.stdout.write(f"{name} {fmt}: {path}")
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.admins.services.core import quantization
+from apps.admins.services.core.detection.detec import FaceDetector
+from apps.admins.services.core.recognition.rec import FaceRecognition
+
+
+class Command(BaseCommand):
+    help = ("Lượng tử hoá INT8 (CPU) backbone RetinaFace và GhostFaceNet, "
+            "hiệu chỉnh bằng ảnh trong một thư mục, lưu cache cạnh file weights")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calibration-dir', required=True,
+                            help="Thư mục ảnh hiệu chỉnh (ảnh điểm danh / ảnh khuôn mặt)")
+        parser.add_argument('--limit', type=int, default=100,
+                            help="Số ảnh tối đa dùng để hiệu chỉnh")
+        parser.add_argument('--engine', default=None,
+                            help="x86 | fbgemm | qnnpack (mặc định settings.QUANTIZATION_ENGINE)")
+
+    def handle(self, *args, **options):
+        engine = quantization.get_engine(options['engine'] or getattr(settings, 'QUANTIZATION_ENGINE', None))
+        images = quantization.read_images(options['calibration_dir'], options['limit'])
+        if not images:
+            raise CommandError(f"Không có ảnh trong {options['calibration_dir']}")
+
+        detector = FaceDetector(
+            device='cpu',
+            max_size=getattr(settings, 'FACE_DETECTION_MAX_SIZE', 1280),
+            size_bucket=getattr(settings, 'FACE_DETECTION_SIZE_BUCKET', 32)
+        )
+        path = detector.calibrate_int8(images, engine)
+        self.stdout.write(f"Detector backbone INT8: {path} ({len(images)} ảnh)")
+
+        # Ảnh 112x112 là khuôn mặt đã align, ảnh khác thì detect + align
+        faces = []
+        for img in images:
+            if img.shape[:2] == (112, 112):
+                faces.append(img)
+            else:
+                faces.extend(detector.detect_single(img)[0])
+        if not faces:
+            raise CommandError("Không tìm thấy khuôn mặt nào để hiệu chỉnh recognizer")
+
+        recognizer = FaceRecognition(device='cpu')
+        path = recognizer.calibrate_int8(faces, engine)
+        self.stdout.write(f"Recognizer INT8: {path} ({len(faces)} khuôn mặt)")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.admins.services.inference_client import get_server_address
+from apps.admins.services.inference_server import InferenceServer, remove_stale_socket
+from apps.admins.services.model_warmup import warm_up_models
+
+
+class Command(BaseCommand):
+    help = ("Chạy inference server giữ model OCR và khuôn mặt cho các Django worker "
+            "(dùng với INFERENCE_BACKEND=server)")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            help="Đường dẫn Unix socket (mặc định settings.INFERENCE_SERVER_ADDRESS)"
+        )
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help="Không chạy inference giả trước khi nhận kết nối"
+        )
+
+    def handle(self, *args, **options):
+        address = options['address'] or get_server_address()
+        # Kiểm tra trước khi load model: không chiếm socket của server đang chạy
+        try:
+            remove_stale_socket(address)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        server = InferenceServer(address=address)
+
+        if not options['no_warmup']:
+            # Model của server đã load trong process, warm-up tại chỗ
+            warm_up_models(remote=False)
+
+        self.stdout.write(f"Inference server listening on {server.address}")
+        try:
+            server.serve_forever()
+        except RuntimeError as e:
+            raise CommandError(str(e))
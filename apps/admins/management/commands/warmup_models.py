@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.admins.services.model_warmup import warm_up_models
+
+
+class Command(BaseCommand):
+    help = "Load PaddleOCR, RetinaFace, GhostFaceNet và chạy inference giả để warm-up"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution', action='append', metavar='HxW',
+            help="Kích thước ảnh warm-up, VD 720x1280 (lặp lại được, "
+                 "mặc định settings.MODEL_WARMUP_RESOLUTIONS)"
+        )
+
+    def handle(self, *args, **options):
+        resolutions = None
+        if options['resolution']:
+            resolutions = [tuple(int(v) for v in r.lower().split('x')) for r in options['resolution']]
+
+        timings = warm_up_models(resolutions)
+
+        for label, seconds in timings.items():
+            self.stdout.write(f"{label:<40} {seconds * 1000:>10.0f} ms")
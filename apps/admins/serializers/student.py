@@ -70,7 +70,7 @@ class StudentCreateSerializer(serializers.ModelSerializer):
         embedding_result = FaceEmbeddingService.extract_face_embedding(
             image_path=absolute_path
         )
-        user_data['vector_embedding'] = embedding_result['vector_str']
+        user_data['vector_embedding_bin'] = embedding_result.get('vector_bytes')
         # Tạo user trước
         user_serializer = UserCreateSerializer(context=self.context)
         user = user_serializer.create(user_data)
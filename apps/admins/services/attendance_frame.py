@@ -0,0 +1,95 @@
+import io
+
+import cv2
+import numpy as np
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage
+from PIL.ExifTags import TAGS
+
+# IFD chứa DateTimeOriginal trong EXIF
+EXIF_IFD = 0x8769
+
+
+class AttendanceFrame:
+    """
+    Ảnh điểm danh đã decode đúng một lần cho mỗi request.
+
+    Giữ ảnh BGR, EXIF và bytes gốc để OCR, nhận diện khuôn mặt,
+    visualization, kiểm tra metadata và lưu file dùng chung.
+    Các service nhận AttendanceFrame ở chỗ nhận image_file.
+
+    Args:
+        image (np.ndarray): Ảnh đã decode (BGR)
+        raw_bytes (bytes): Bytes gốc của file upload
+        exif (dict): EXIF dạng {tên tag: giá trị}
+        name (str): Tên file upload
+    """
+
+    def __init__(self, image, raw_bytes=b'', exif=None, name=None):
+        self.image = image
+        self.raw_bytes = raw_bytes
+        self.exif = exif or {}
+        self.name = name
+
+    @classmethod
+    def from_file(cls, image_file):
+        """
+        Đọc Django UploadedFile một lần và decode thành AttendanceFrame.
+
+        Args:
+            image_file: Django UploadedFile object
+
+        Returns:
+            AttendanceFrame
+        """
+        if isinstance(image_file, cls):
+            return image_file
+
+        try:
+            image_file.seek(0)
+            raw_bytes = image_file.read()
+            image_file.seek(0)
+
+            image = cv2.imdecode(np.frombuffer(raw_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("Cannot decode image")
+        except Exception as e:
+            raise ValueError(f"Error reading image file: {str(e)}")
+
+        return cls(
+            image=image,
+            raw_bytes=raw_bytes,
+            exif=cls._read_exif(raw_bytes),
+            name=getattr(image_file, 'name', None)
+        )
+
+    @staticmethod
+    def _read_exif(raw_bytes):
+        """
+        Đọc EXIF từ bytes gốc. PIL chỉ parse header, không decode pixel.
+
+        Returns:
+            dict: {tên tag: giá trị}, rỗng nếu ảnh không có EXIF
+        """
+        try:
+            with PILImage.open(io.BytesIO(raw_bytes)) as pil_image:
+                exif = pil_image.getexif()
+                items = dict(exif.items())
+                items.update(exif.get_ifd(EXIF_IFD))
+        except Exception as e:
+            print(f"Error reading image metadata: {str(e)}")
+            return {}
+
+        return {TAGS.get(tag_id, tag_id): value for tag_id, value in items.items()}
+
+    @property
+    def height(self):
+        return self.image.shape[0]
+
+    @property
+    def width(self):
+        return self.image.shape[1]
+
+    def to_content_file(self):
+        """Bytes gốc dưới dạng ContentFile để lưu bằng default_storage."""
+        return ContentFile(self.raw_bytes, name=self.name)
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+
+from apps.admins.services.face_embedding_service import FaceEmbeddingService
+from apps.admins.services.ocr_service import OCRService
+
+
+class AttendancePipeline:
+    """
+    Chạy OCR mã phòng và trích xuất khuôn mặt cho một ảnh điểm danh.
+
+    Hai bước chỉ phụ thuộc vào cùng một AttendanceFrame nên ở chế độ song song
+    (ATTENDANCE_PARALLEL_PIPELINE) trích xuất khuôn mặt được đẩy vào thread pool
+    trong khi OCR chạy, thời gian xử lý còn khoảng max(OCR, faces) thay vì tổng.
+    Nếu OCR báo sai phòng thì task khuôn mặt bị huỷ: future.cancel() nếu chưa
+    chạy, nếu đang chạy thì cancel_event báo task dừng ở ranh giới giữa
+    detect và recognize (một forward pass đang chạy không dừng giữa chừng,
+    nên worker bị giữ tối đa thêm một bước).
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls):
+        """Singleton ThreadPoolExecutor dùng chung trong process"""
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=getattr(settings, 'ATTENDANCE_PIPELINE_WORKERS', 4),
+                        thread_name_prefix='attendance-faces'
+                    )
+        return cls._executor
+
+    @classmethod
+    def run(cls, frame, expected_room_code, confidence_threshold=0.5, parallel=None):
+        """
+        Validate mã phòng và trích xuất khuôn mặt từ ảnh.
+
+        Args:
+            frame (AttendanceFrame): Ảnh điểm danh đã decode
+            expected_room_code (str): Mã phòng dự kiến từ database
+            confidence_threshold (float): Ngưỡng confidence của OCR
+            parallel (bool): Chạy song song OCR và khuôn mặt
+                (default: settings.ATTENDANCE_PARALLEL_PIPELINE)
+
+        Returns:
+            tuple: (ocr_result, extraction_result)
+                - ocr_result: kết quả OCRService.validate_room_code_with_database
+                - extraction_result: kết quả
+                  FaceEmbeddingService.extract_face_boxes_with_details,
+                  None nếu OCR không khớp mã phòng
+        """
+        if parallel is None:
+            parallel = getattr(settings, 'ATTENDANCE_PARALLEL_PIPELINE', True)
+
+        if not parallel:
+            ocr_result = OCRService.validate_room_code_with_database(
+                expected_room_code=expected_room_code,
+                image_file=frame,
+                confidence_threshold=confidence_threshold
+            )
+            if not (ocr_result['is_valid'] and ocr_result['is_matched']):
+                return ocr_result, None
+
+            extraction_result = FaceEmbeddingService.extract_face_boxes_with_details(
+                image_file=frame
+            )
+            return ocr_result, extraction_result
+
+        cancel_event = threading.Event()
+        face_future = cls.get_executor().submit(
+            FaceEmbeddingService.extract_face_boxes_with_details,
+            image_file=frame,
+            cancel_event=cancel_event
+        )
+
+        # OCR chạy trên thread của request trong lúc thread pool trích xuất khuôn mặt
+        try:
+            ocr_result = OCRService.validate_room_code_with_database(
+                expected_room_code=expected_room_code,
+                image_file=frame,
+                confidence_threshold=confidence_threshold
+            )
+        except BaseException:
+            cancel_event.set()
+            face_future.cancel()
+            raise
+
+        if not (ocr_result['is_valid'] and ocr_result['is_matched']):
+            # Sai phòng: huỷ nếu chưa chạy, nếu đang chạy thì dừng sau bước
+            # detect/recognize hiện tại và bỏ qua kết quả
+            cancel_event.set()
+            face_future.cancel()
+            return ocr_result, None
+
+        return ocr_result, face_future.result()
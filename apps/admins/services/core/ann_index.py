@@ -0,0 +1,186 @@
+"""
+Inverted-file (IVF-flat) approximate nearest-neighbour index for
+L2-normalized face embeddings, in NumPy/torch only.
+
+Vectors are clustered with spherical k-means into ``nlist`` lists and
+stored sorted by list, so every list is one contiguous block of the
+``vectors.npy`` file. A query scores the centroids, then only the
+``nprobe`` closest lists, with the GEMM kernel of ``core.similarity``.
+
+On disk (one directory)::
+
+    centroids.npy   (nlist, D) float32
+    offsets.npy     (nlist + 1,) int64, list i is rows offsets[i]:offsets[i+1]
+    vectors.npy     (N, D) float32 or float16, sorted by list
+    ids.npy         (N,) int64, parallel to vectors
+
+``vectors.npy`` and ``ids.npy`` are memory-mapped when loaded, so opening
+the index costs no reads and worker processes share the page cache.
+"""
+import math
+import os
+
+import numpy as np
+import torch
+
+from apps.admins.services.core import similarity
+
+INDEX_FILES = ('centroids.npy', 'offsets.npy', 'vectors.npy', 'ids.npy')
+
+
+def default_nlist(n_vectors):
+    """About 4 * sqrt(N) lists (~sqrt(N) / 4 vectors per list)."""
+    return max(1, min(n_vectors // 8, int(4 * math.sqrt(n_vectors))))
+
+
+def train_centroids(vectors, nlist, iterations=15, seed=0):
+    """
+    Spherical k-means.
+
+    Args:
+        vectors (np.ndarray): (N, D) unit vectors
+        nlist (int): Number of clusters
+        iterations (int): Lloyd iterations
+
+    Returns:
+        np.ndarray: (nlist, D) float32 unit centroids
+    """
+    generator = np.random.default_rng(seed)
+    data = similarity.as_gallery(vectors)
+    centroids = data[torch.from_numpy(generator.choice(len(data), nlist, replace=False))].clone()
+
+    for _ in range(iterations):
+        assignment = similarity.cosine_similarity(data, centroids).argmax(dim=1)
+        sums = torch.zeros_like(centroids).index_add_(0, assignment, data)
+        counts = torch.bincount(assignment, minlength=nlist)
+
+        # Empty clusters restart from random vectors
+        empty = (counts == 0).nonzero().flatten()
+        if len(empty):
+            sums[empty] = data[torch.from_numpy(generator.choice(len(data), len(empty), replace=False))]
+
+        centroids = torch.nn.functional.normalize(sums, dim=1)
+
+    return centroids.numpy()
+
+
+class IVFIndex:
+    """
+    Read-only IVF-flat index.
+
+    Args:
+        centroids (np.ndarray): (nlist, D) float32
+        offsets (np.ndarray): (nlist + 1,) int64
+        vectors (np.ndarray): (N, D) float32/float16, sorted by list
+        ids (np.ndarray): (N,) int64
+    """
+
+    def __init__(self, centroids, offsets, vectors, ids):
+        self.centroids = similarity.as_gallery(centroids)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.vectors = vectors
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, ids, vectors, nlist=None, dtype=np.float32):
+        """
+        Cluster and sort vectors into an in-memory index.
+
+        Args:
+            ids (array-like): (N,) int ids
+            vectors (np.ndarray): (N, D) unit vectors
+            nlist (int): Number of lists, None for ``default_nlist``
+            dtype: Storage dtype of the vectors (np.float32 or np.float16)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # shape[-1], not -1: an empty (0, D) gallery cannot infer its width
+        vectors = np.ascontiguousarray(vectors.reshape(len(ids), vectors.shape[-1]))
+        nlist = min(nlist or default_nlist(len(ids)), len(ids)) or 1
+
+        if len(ids) == 0:
+            return cls(np.zeros((1, vectors.shape[1]), dtype=np.float32),
+                       np.zeros(2, dtype=np.int64), vectors.astype(dtype), ids)
+
+        if nlist == 1:
+            centroids = vectors.mean(axis=0, keepdims=True)
+            centroids /= max(np.linalg.norm(centroids), 1e-12)
+            assignment = np.zeros(len(ids), dtype=np.int64)
+        else:
+            centroids = train_centroids(vectors, nlist)
+            assignment = similarity.cosine_similarity(
+                vectors, similarity.as_gallery(centroids)
+            ).argmax(dim=1).numpy()
+
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+
+        return cls(
+            centroids.astype(np.float32),
+            offsets,
+            np.ascontiguousarray(vectors[order], dtype=dtype),
+            np.ascontiguousarray(ids[order])
+        )
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'centroids.npy'), self.centroids.numpy())
+        np.save(os.path.join(directory, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(directory, 'vectors.npy'), np.asarray(self.vectors))
+        np.save(os.path.join(directory, 'ids.npy'), np.asarray(self.ids))
+
+    @classmethod
+    def load(cls, directory):
+        """Open a saved index, vectors and ids memory-mapped read-only."""
+        return cls(
+            np.load(os.path.join(directory, 'centroids.npy')),
+            np.load(os.path.join(directory, 'offsets.npy')),
+            np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        )
+
+    def _probe_rows(self, query, nprobe):
+        if self.nlist == 1:
+            return slice(0, len(self.ids))
+
+        lists = similarity.topk(query, self.centroids, nprobe)[1][0].numpy()
+        lists.sort()  # read the file front to back
+        return np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+        ])
+
+    def search(self, query, k, nprobe=32):
+        """
+        Approximate k nearest neighbours of one query.
+
+        Args:
+            query: (D,) unit vector
+            k (int): Number of neighbours
+            nprobe (int): Lists to scan (nlist = exact search)
+
+        Returns:
+            tuple: (distances, ids) 1-D arrays, closest first
+        """
+        if len(self.ids) == 0 or k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        rows = self._probe_rows(query, nprobe)
+        # Probed lists are copied out of the mmap as float32 for the GEMM
+        block = similarity.as_gallery(self.vectors[rows])
+        distances, indices = similarity.topk(query, block, k)
+
+        ids = self.ids[rows]
+        return distances[0].numpy(), np.asarray(ids[indices[0].numpy()], dtype=np.int64)
+
+
+def exists(directory):
+    """Whether ``directory`` holds a complete saved index."""
+    return all(os.path.exists(os.path.join(directory, name)) for name in INDEX_FILES)
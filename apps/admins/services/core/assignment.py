@@ -0,0 +1,123 @@
+"""
+One-to-one assignment of detected faces to enrolled students.
+
+Given the (F, S) face-to-student distance matrix, every face gets at most
+one student and every student at most one face, only for pairs under the
+threshold. Two solvers:
+
+- 'hungarian': globally optimal with ``scipy.optimize.linear_sum_assignment``.
+  Each face gets a dummy "unmatched" column costing ``threshold``, so the
+  solution maximizes the summed margin ``threshold - distance`` of the
+  matched pairs.
+- 'greedy': greedy by global distance order, computed as rounds of mutual
+  nearest neighbours (a pair that is the minimum of both its row and its
+  column is exactly the next pair the global sort would take). Each round
+  is a couple of reductions over the matrix on its own device.
+
+'hungarian' falls back to 'greedy' when scipy is not installed.
+"""
+import numpy as np
+import torch
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional, 'greedy' needs only torch
+    linear_sum_assignment = None
+
+ASSIGNMENT_METHODS = ('hungarian', 'greedy')
+
+
+def _hungarian(distances, threshold):
+    cost = distances.detach().cpu().double().numpy()
+    n_faces, n_students = cost.shape
+    # Disallowed pairs cost more than the face's own dummy column
+    forbidden = threshold + 1.0
+
+    padded = np.full((n_faces, n_students + n_faces), forbidden)
+    padded[:, :n_students] = np.where(cost < threshold, cost, forbidden)
+    padded[np.arange(n_faces), n_students + np.arange(n_faces)] = threshold
+
+    rows, cols = linear_sum_assignment(padded)
+    keep = cols < n_students
+    return rows[keep], cols[keep]
+
+
+def _greedy(distances, threshold):
+    n_faces, n_students = distances.shape
+    remaining = torch.where(
+        distances < threshold, distances, torch.full_like(distances, float('inf'))
+    )
+    face_index = torch.arange(n_faces, device=distances.device)
+
+    rows, cols = [], []
+    while True:
+        row_min, row_arg = remaining.min(dim=1)
+        col_arg = remaining.argmin(dim=0)
+        mutual = torch.isfinite(row_min) & (col_arg[row_arg] == face_index)
+        if mutual.any():
+            new_rows = face_index[mutual]
+            new_cols = row_arg[mutual]
+        else:
+            # Only exact ties can leave no mutual pair: take the global minimum
+            best = remaining.argmin()
+            if not torch.isfinite(remaining.view(-1)[best]):
+                break
+            new_rows = (best // n_students).view(1)
+            new_cols = (best % n_students).view(1)
+
+        rows.append(new_rows)
+        cols.append(new_cols)
+        remaining[new_rows, :] = float('inf')
+        remaining[:, new_cols] = float('inf')
+
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return torch.cat(rows).cpu().numpy(), torch.cat(cols).cpu().numpy()
+
+
+def assign(distances, threshold, method='hungarian'):
+    """
+    Solve the face/student assignment under a distance threshold.
+
+    Args:
+        distances (torch.Tensor): (F, S) distances, on any device
+        threshold (float): Pairs at or above it are never matched
+        method (str): 'hungarian' or 'greedy'
+
+    Returns:
+        tuple: (face_indices, student_indices) int64 arrays, sorted by face
+    """
+    if method not in ASSIGNMENT_METHODS:
+        raise ValueError(f"Unknown assignment method '{method}', expected one of {ASSIGNMENT_METHODS}")
+
+    if distances.numel() == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    if method == 'hungarian' and linear_sum_assignment is not None:
+        rows, cols = _hungarian(distances, threshold)
+    else:
+        rows, cols = _greedy(distances, threshold)
+
+    order = np.argsort(rows, kind='stable')
+    return rows[order].astype(np.int64), cols[order].astype(np.int64)
+
+
+def top_candidates(distances, threshold, k):
+    """
+    The k closest students under the threshold for every face.
+
+    Returns:
+        list: Per face, a list of (student_index, distance), closest first
+    """
+    k = min(k, distances.shape[1])
+    if k <= 0:
+        return [[] for _ in range(distances.shape[0])]
+
+    values, indices = torch.topk(distances, k, dim=1, largest=False)
+    values, indices = values.cpu().tolist(), indices.cpu().tolist()
+    return [
+        [(index, value) for index, value in zip(row_indices, row_values) if value < threshold]
+        for row_indices, row_values in zip(indices, values)
+    ]
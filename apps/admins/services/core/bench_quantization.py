@@ -0,0 +1,120 @@
+"""
+Latency and accuracy of the INT8 CPU path against float32.
+
+Detector: per-image latency of the float and INT8-backbone RetinaFace, and
+for every float detection the IoU / landmark drift of its best INT8 match.
+Recognizer: latency, embedding drift and flipped match decisions of the INT8
+GhostFaceNet against fp32 (same metrics as recognition.check_precision).
+
+Build the INT8 caches first:
+    python manage.py quantize_face_models --calibration-dir DIR
+
+Usage:
+    python -m apps.admins.services.core.bench_quantization IMAGE_DIR
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from apps.admins.services.core import quantization
+from apps.admins.services.core.detection.detec import FaceDetector
+from apps.admins.services.core.recognition.check_precision import embed, load_faces, pairwise_distances
+from apps.admins.services.core.recognition.rec import FaceRecognition
+
+
+def box_iou(a, b):
+    """IoU matrix between boxes a [N, 4] and b [M, 4]."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=-1)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=-1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=-1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter)
+
+
+def run_detector(detector, images):
+    detector.detect_single(images[0])  # warm-up
+    results = []
+    start = time.perf_counter()
+    for img in images:
+        _, boxes, _, landmarks = detector.detect_single(img, return_aligned=False)
+        results.append((np.array(boxes).reshape(-1, 4), np.array(landmarks).reshape(-1, 5, 2)))
+    return (time.perf_counter() - start) / len(images), results
+
+
+def bench_detector(images, max_size, engine):
+    float_detector = FaceDetector(device='cpu', max_size=max_size, size_bucket=32)
+    int8_detector = FaceDetector(device='cpu', max_size=max_size, size_bucket=32,
+                                 quantized=True, quantization_engine=engine)
+    if not int8_detector.quantized:
+        print("  detector    skipped (no INT8 backbone cache)")
+        return
+
+    float_time, float_results = run_detector(float_detector, images)
+    int8_time, int8_results = run_detector(int8_detector, images)
+
+    ious, landmark_drift, missed, extra = [], [], 0, 0
+    for (f_boxes, f_landms), (q_boxes, q_landms) in zip(float_results, int8_results):
+        extra += max(0, len(q_boxes) - len(f_boxes))
+        if len(f_boxes) == 0:
+            continue
+        if len(q_boxes) == 0:
+            missed += len(f_boxes)
+            continue
+        iou = box_iou(f_boxes, q_boxes)
+        best = iou.argmax(axis=1)
+        ious.extend(iou[np.arange(len(f_boxes)), best])
+        missed += int((iou.max(axis=1) < 0.5).sum())
+        landmark_drift.extend(np.abs(f_landms - q_landms[best]).max(axis=(1, 2)))
+
+    print(f"  detector    float {float_time * 1000:8.2f} ms/img  int8 {int8_time * 1000:8.2f} ms/img")
+    if ious:
+        print(f"              mean IoU {np.mean(ious):.4f}  min IoU {np.min(ious):.4f}  "
+              f"max landmark drift {np.max(landmark_drift):.2f} px  missed {missed}  extra {extra}")
+
+
+def bench_recognizer(faces, engine, repeat):
+    fp32 = FaceRecognition(device='cpu')
+    int8 = FaceRecognition(device='cpu', precision='int8', quantization_engine=engine)
+    if int8.precision != 'int8':
+        print("  recognizer  skipped (no INT8 model cache)")
+        return
+
+    fp32_time, fp32_features = embed(fp32, faces, repeat)
+    int8_time, int8_features = embed(int8, faces, repeat)
+
+    drift = np.linalg.norm(int8_features - fp32_features, axis=1)
+    distances, base_distances = pairwise_distances(int8_features), pairwise_distances(fp32_features)
+    flipped = ((distances < fp32.threshold) != (base_distances < fp32.threshold)).sum() // 2
+
+    print(f"  recognizer  fp32 {fp32_time * 1000:8.2f} ms  int8 {int8_time * 1000:8.2f} ms  ({len(faces)} faces)")
+    print(f"              embedding drift max {drift.max():.5f}  "
+          f"distance drift max {np.abs(distances - base_distances).max():.5f}  decisions flipped {flipped}")
+
+
+def main(image_dir, engine=None, max_size=1280, limit=50, repeat=3):
+    engine = quantization.get_engine(engine)
+    images = quantization.read_images(image_dir, limit)
+    if not images:
+        print(f"No images found in {image_dir}")
+        return
+
+    print(f"INT8 benchmark: {len(images)} images, engine {engine}, {torch.get_num_threads()} threads")
+    bench_detector(images, max_size, engine)
+
+    faces = load_faces(image_dir, device='cpu')
+    if faces:
+        bench_recognizer(faces, engine, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image_dir')
+    parser.add_argument('--engine', default=None)
+    parser.add_argument('--max-size', type=int, default=1280)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.image_dir, args.engine, args.max_size, args.limit, args.repeat)
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+
+
+def similarity_transform_batch(src, dst):
+    """
+    Batched Umeyama estimation of 2D similarity transforms.
+
+    Vectorized equivalent of calling
+    ``skimage.transform.SimilarityTransform().estimate(src[i], dst)`` for
+    every face.
+
+    Args:
+        src (np.ndarray): Source landmarks [N, P, 2]
+        dst (np.ndarray): Template landmarks [P, 2]
+
+    Returns:
+        np.ndarray: Affine matrices [N, 2, 3] mapping src onto dst
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    num_points = src.shape[1]
+
+    src_mean = src.mean(axis=1, keepdims=True)  # [N, 1, 2]
+    dst_mean = dst.mean(axis=0)  # [2]
+    src_demean = src - src_mean
+    dst_demean = dst - dst_mean
+
+    # Covariance between template and source points: [N, 2, 2]
+    A = np.einsum('pi,npj->nij', dst_demean, src_demean) / num_points
+
+    d = np.ones((len(src), 2))
+    d[np.linalg.det(A) < 0, 1] = -1
+
+    U, S, V = np.linalg.svd(A)
+
+    # Rank-deficient covariance (rank 1): keep the reflection-free solution
+    rank_one = S[:, 1] <= S[:, 0] * np.finfo(np.float64).eps * 2
+    proper = np.linalg.det(U) * np.linalg.det(V) > 0
+    d_rot = d.copy()
+    d_rot[rank_one & proper] = 1
+    d_rot[rank_one & ~proper, 1] = -1
+
+    R = U @ (d_rot[:, :, None] * V)  # U @ diag(d) @ V
+    scale = (S * d).sum(axis=1) / src_demean.var(axis=1).sum(axis=1)
+
+    M = np.empty((len(src), 2, 3))
+    M[:, :, :2] = R * scale[:, None, None]
+    M[:, :, 2] = dst_mean - scale[:, None] * np.einsum('nij,nj->ni', R, src_mean[:, 0])
+    return M
+
+
+def warp_faces(img, matrices, size=(112, 112)):
+    """
+    Warp every face of an image with its affine matrix.
+
+    Args:
+        img (np.ndarray): Source image
+        matrices (np.ndarray): Affine matrices [N, 2, 3]
+        size (tuple): Output (width, height)
+
+    Returns:
+        list: Aligned face images
+    """
+    return [cv2.warpAffine(img, M, size, borderValue=0.0) for M in matrices]
@@ -1,14 +1,16 @@
 import os
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
 import torch
 from django.conf import settings
-from skimage import transform as trans
 from  apps.admins.services.core.detection.prior_box import PriorBox
-from  apps.admins.services.core.detection.retinaface import RetinaFace
 from apps.admins.services.core.detection.box_utils import decode, decode_landm
 from apps.admins.services.core.detection.custom_config import cfg_mnet
-from apps.admins.services.core.detection.py_cpu_nms import py_cpu_nms
+from apps.admins.services.core.detection.align import similarity_transform_batch, warp_faces
+from apps.admins.services.core.detection.nms import get_nms
+from apps.admins.services.core import quantization, runtime
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))  # thư mục detection
 CORE_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))  # sang thư mục core
@@ -17,15 +19,45 @@ class FaceDetector:
     """
     Face detection and alignment using RetinaFace model.
 
+    Thread safety:
+        A single instance may be shared by several request threads. After
+        construction the detector holds no per-request state: ``detect_single``
+        and ``detect_batch`` take the image size from their input and keep the
+        matching prior boxes as local variables. The only shared mutable state
+        is the prior box cache, which is guarded by a lock; input staging
+        buffers are thread-local. Detection
+        parameters (thresholds, top-K) must not be changed while requests are
+        in flight.
+
     Args:
-        img_width (int): Input image width (default: 1280)
-        img_height (int): Input image height (default: 720)
+        img_width (int): Default image width, its priors are pre-built (default: 1280)
+        img_height (int): Default image height, its priors are pre-built (default: 720)
         device (str): Device to run model on ('cuda' or 'cpu')
         weight_path (str): Path to model weights
         confidence_threshold (float): Minimum confidence score for detection
         nms_threshold (float): NMS threshold for removing duplicate detections
         vis_threshold (float): Visualization threshold for display
         cfg: Model configuration (default: cfg_mnet)
+        prior_cache_size (int): Number of (height, width, device) prior tensors
+            kept in the LRU cache (default: 8)
+        max_size (int): Downscale images so that their longest side is at most
+            this many pixels before running the network. Boxes and landmarks
+            are mapped back to the original image and alignment keeps using
+            the full-resolution pixels. None disables resizing (default: None)
+        size_bucket (int): Pad the (resized) network input on the bottom/right
+            up to a multiple of this many pixels, so that nearby resolutions
+            share one input shape and one cached prior tensor. None or 1
+            disables padding (default: None)
+        nms_backend (str): 'auto', 'torchvision' or 'numpy'. 'auto' uses
+            torchvision.ops.batched_nms when available (default: 'auto')
+        quantized (bool): CPU only. Run the MobileNetV1 backbone as INT8
+            from the cache written by ``calibrate_int8``; without a cache the
+            float backbone is kept (default: False)
+        quantization_engine (str): Quantized kernel backend, see
+            ``quantization.get_engine`` (default: None)
+        backend (str): 'torch' (eager RetinaFace), 'torchscript' or 'onnx'
+            (files from ``manage.py export_face_models``, see
+            ``runtime.load_exported``). 'onnx' runs on CPU (default: 'torch')
     """
 
     def __init__(
@@ -39,9 +71,21 @@ class FaceDetector:
             vis_threshold=0.9,
             top_k=1000,
             keep_top_k=100,
-            cfg=cfg_mnet
+            cfg=cfg_mnet,
+            prior_cache_size=8,
+            max_size=None,
+            size_bucket=None,
+            nms_backend='auto',
+            quantized=False,
+            quantization_engine=None,
+            backend='torch'
     ):
+        if backend == 'onnx' and torch.device(device).type != 'cpu':
+            print(f"ONNX backend runs on CPU, ignoring device {device}")
+            device = 'cpu'
+
         self.device = device
+        self.backend = backend
         self.cfg = cfg
         self.weight_path = weight_path
         self.im_width = img_width
@@ -53,14 +97,31 @@ class FaceDetector:
         self.vis_threshold = vis_threshold
         self.top_k = top_k
         self.keep_top_k = keep_top_k
-        self.resize = 1
+        self.nms = get_nms(nms_backend)
+
+        # Resize front-end parameters
+        self.max_size = max_size
+        self.size_bucket = size_bucket
+
+        # LRU cache of prior boxes keyed by (height, width, device)
+        self.prior_cache_size = prior_cache_size
+        self._prior_cache = OrderedDict()
+        self._prior_lock = threading.Lock()
+
+        # INT8 backbone (CPU, eager backend only)
+        self.quantized = quantized and backend == 'torch' and torch.device(device).type == 'cpu'
+        self.quantization_engine = quantization_engine
 
         # Load model
         self.net = self._load_model()
-        self.prior_data = self._create_prior_box()
+        self.get_prior_box(self.im_height, self.im_width)
 
         # Preprocessing parameters
         self.mean = np.array([104, 117, 123], dtype=np.float32)
+        self._mean_uint8 = self.mean.astype(np.uint8)
+        self._mean_tensor = torch.from_numpy(self.mean).view(1, 3, 1, 1).to(self.device)
+        self._use_pinned_memory = str(self.device).startswith('cuda')
+        self._staging = threading.local()
 
         # Alignment template (standard face landmarks)
         self.dst_landmarks = np.array([
@@ -73,7 +134,14 @@ class FaceDetector:
         self.dst_landmarks[:, 0] += 8.0
 
     def _load_model(self):
-        """Load RetinaFace model from weights."""
+        """Load RetinaFace model from weights (or its exported version)."""
+        if self.backend != 'torch':
+            net = runtime.load_exported(self.backend, self.weight_path, self.device)
+            print(f'Loaded {self.backend} model for {self.weight_path}')
+            return net
+
+        from apps.admins.services.core.detection.retinaface import RetinaFace
+
         print(f'Loading pretrained model from {self.weight_path}')
 
         net = RetinaFace(cfg=self.cfg, phase='test')
@@ -89,18 +157,89 @@ class FaceDetector:
         net.eval()
         net = net.to(self.device)
 
+        if self.quantized:
+            self._load_int8_backbone(net)
+
         print('Model loaded successfully!')
         return net
 
-    def _create_prior_box(self):
-        """Create prior boxes for detection."""
+    def _int8_cache_path(self, engine):
+        return quantization.cache_path(self.weight_path, engine, suffix='.body')
+
+    def _load_int8_backbone(self, net):
+        """Swap the backbone of ``net`` for its cached INT8 version, if any."""
+        engine = quantization.get_engine(self.quantization_engine)
+        path = self._int8_cache_path(engine)
+        example = torch.zeros(1, 3, self.im_height, self.im_width)
+        body = quantization.load(net.body, example, path, engine)
+        if body is None:
+            print(f"No INT8 backbone at {path}, using float32 "
+                  f"(run: python manage.py quantize_face_models)")
+            self.quantized = False
+            return
+        net.body = body
+        print(f"Loaded INT8 backbone from {path}")
+
+    def calibrate_int8(self, images, engine=None):
+        """
+        Quantize the backbone to INT8 with ``images`` as calibration data and
+        write it to the cache loaded by ``quantized=True``.
+
+        Args:
+            images (list): BGR images, preprocessed like ``detect_single`` inputs
+            engine (str): Quantization engine (default: self.quantization_engine)
+
+        Returns:
+            str: Path of the written cache
+        """
+        if self.quantized or self.backend != 'torch':
+            raise ValueError("calibrate_int8 needs a float32 eager detector (quantized=False, backend='torch')")
+
+        engine = quantization.get_engine(engine or self.quantization_engine)
+
+        def calibration_inputs():
+            for img in images:
+                net_img, _ = self._resize_for_detection(img)
+                height, width = self._canvas_size(*net_img.shape[:2])
+                yield self._preprocess([net_img], height, width).cpu()
+
+        example = torch.zeros(1, 3, self.im_height, self.im_width)
+        body = quantization.quantize(self.net.body.cpu(), example, calibration_inputs(), engine)
+        self.net.body.to(self.device)
+
+        path = self._int8_cache_path(engine)
+        quantization.save(body, path)
+        return path
+
+    def get_prior_box(self, im_height, im_width):
+        """
+        Get prior boxes for an image size, reusing cached tensors.
+
+        Args:
+            im_height (int): Image height
+            im_width (int): Image width
+
+        Returns:
+            torch.Tensor: Prior boxes [num_priors, 4] on self.device
+        """
+        key = (int(im_height), int(im_width), str(self.device))
+        with self._prior_lock:
+            priors = self._prior_cache.get(key)
+            if priors is not None:
+                self._prior_cache.move_to_end(key)
+                return priors
+
         priorbox = PriorBox(
             self.cfg,
-            image_size=(self.im_height, self.im_width)
+            image_size=(key[0], key[1])
         )
-        priors = priorbox.forward()
-        priors = priors.to(self.device)
-        return priors.data
+        priors = priorbox.forward().to(self.device).data
+
+        with self._prior_lock:
+            self._prior_cache[key] = priors
+            while len(self._prior_cache) > self.prior_cache_size:
+                self._prior_cache.popitem(last=False)
+        return priors
 
     @staticmethod
     def _remove_prefix(state_dict, prefix):
@@ -108,13 +247,101 @@ class FaceDetector:
         f = lambda x: x.split(prefix, 1)[-1] if x.startswith(prefix) else x
         return {f(key): value for key, value in state_dict.items()}
 
-    def _preprocess(self, img):
-        """Preprocess image for model input."""
-        img = img.astype(np.float32)
-        img -= self.mean
-        img = img.transpose(2, 0, 1)  # HWC -> CHW
-        img = torch.from_numpy(img).unsqueeze(0)  # Add batch dimension
-        return img.to(self.device)
+    def _resize_for_detection(self, img):
+        """
+        Downscale an image for the network input.
+
+        Args:
+            img (np.ndarray): Input image (BGR format)
+
+        Returns:
+            tuple: (net_img, resize)
+                - net_img: image fed to the network (before bucket padding)
+                - resize: factor from original to network coordinates
+        """
+        im_height, im_width = img.shape[:2]
+
+        resize = 1.0
+        if self.max_size and max(im_height, im_width) > self.max_size:
+            resize = self.max_size / max(im_height, im_width)
+            new_width = max(1, int(round(im_width * resize)))
+            new_height = max(1, int(round(im_height * resize)))
+            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+        return img, resize
+
+    def _canvas_size(self, height, width):
+        """Round a network input size up to the next multiple of size_bucket."""
+        if self.size_bucket and self.size_bucket > 1:
+            height += -height % self.size_bucket
+            width += -width % self.size_bucket
+        return height, width
+
+    def _staging_buffer(self, shape):
+        """
+        Get this thread's reusable uint8 staging buffer for a batch of images.
+
+        On CUDA the buffer is pinned so that the host-to-device copy can run
+        asynchronously. The buffer only grows; smaller batches use a view of it.
+        """
+        numel = int(np.prod(shape))
+        staging = self._staging
+        buffer = getattr(staging, 'buffer', None)
+
+        # The previous async copy must finish before the buffer is rewritten
+        event = getattr(staging, 'event', None)
+        if event is not None:
+            event.synchronize()
+            staging.event = None
+
+        if buffer is None or buffer.numel() < numel:
+            buffer = torch.empty(numel, dtype=torch.uint8,
+                                 pin_memory=self._use_pinned_memory)
+            staging.buffer = buffer
+        return buffer[:numel].view(shape)
+
+    def _preprocess(self, imgs, height, width):
+        """
+        Preprocess images into one model input tensor.
+
+        Images are copied once as uint8 into the bottom/right padded canvas,
+        moved to the device, and converted with a single fused op that
+        changes the layout to NCHW, casts to float32 and subtracts the mean.
+        Padding uses the mean color, i.e. zeros after mean subtraction, so
+        padded areas look like the network's own zero padding.
+
+        Args:
+            imgs (list): Images (BGR, uint8) no larger than (height, width)
+            height (int): Canvas height
+            width (int): Canvas width
+
+        Returns:
+            torch.Tensor: Input tensor [N, 3, height, width] on self.device
+        """
+        shape = (len(imgs), height, width, 3)
+        if (len(imgs) == 1 and imgs[0].shape[:2] == (height, width)
+                and not self._use_pinned_memory):
+            # Zero-copy view of the decoded frame
+            batch = torch.from_numpy(np.ascontiguousarray(imgs[0])).unsqueeze(0)
+        else:
+            batch = self._staging_buffer(shape)
+            batch_np = batch.numpy()
+            for i, img in enumerate(imgs):
+                h, w = img.shape[:2]
+                batch_np[i, :h, :w] = img
+                if h < height or w < width:
+                    batch_np[i, h:, :] = self._mean_uint8
+                    batch_np[i, :h, w:] = self._mean_uint8
+
+        batch = batch.to(self.device, non_blocking=self._use_pinned_memory)
+        if self._use_pinned_memory:
+            self._staging.event = torch.cuda.Event()
+            self._staging.event.record()
+
+        out = torch.empty((len(imgs), 3, height, width),
+                          dtype=torch.float32, device=self.device)
+        torch.sub(batch.permute(0, 3, 1, 2), self._mean_tensor, out=out)
+        return out
 
     def align_face(self, img, landmarks):
         """
@@ -127,19 +354,92 @@ class FaceDetector:
         Returns:
             np.ndarray: Aligned face image (112x112)
         """
-        src = landmarks.astype(np.float32)
-        tform = trans.SimilarityTransform()
-        tform.estimate(src, self.dst_landmarks)
-        M = tform.params[0:2, :]
-        aligned = cv2.warpAffine(img, M, (112, 112), borderValue=0.0)
-        return aligned
+        return self.align_faces(img, [landmarks])[0]
+
+    def align_faces(self, img, landmarks):
+        """
+        Align all faces of an image in one batched similarity estimation.
+
+        Args:
+            img (np.ndarray): Input image
+            landmarks (list or np.ndarray): Face landmarks [N, 5, 2]
+
+        Returns:
+            list: Aligned face images (112x112)
+        """
+        if len(landmarks) == 0:
+            return []
+        src = np.asarray(landmarks, dtype=np.float32).reshape(-1, 5, 2)
+        matrices = similarity_transform_batch(src, self.dst_landmarks)
+        return warp_faces(img, matrices, (112, 112))
+
+    def _postprocess(self, loc, conf, landms, priors, im_height, im_width, resize=1.0):
+        """
+        Decode raw network outputs of one image into final detections.
+
+        Confidence filtering, top-K, decoding and NMS all run as tensor ops on
+        the model's device; only the surviving detections are copied to host.
+
+        Args:
+            loc (torch.Tensor): Box regressions [num_priors, 4]
+            conf (torch.Tensor): Class scores [num_priors, 2]
+            landms (torch.Tensor): Landmark regressions [num_priors, 10]
+            priors (torch.Tensor): Prior boxes matching the input size
+            im_height (int): Network input height
+            im_width (int): Network input width
+            resize (float): Factor from original to network coordinates,
+                used to map detections back to the original image
+
+        Returns:
+            tuple: (dets, landms)
+                - dets: np.ndarray [K, 5] of (x1, y1, x2, y2, score)
+                - landms: np.ndarray [K, 10] of landmark coordinates
+        """
+        # Filter by confidence
+        scores = conf[:, 1]
+        inds = torch.nonzero(scores > self.confidence_threshold).squeeze(1)
+        scores = scores[inds]
+
+        # Keep top-K before NMS
+        scores, order = torch.sort(scores, descending=True)
+        scores = scores[:self.top_k]
+        inds = inds[order[:self.top_k]]
+
+        # Decode only the surviving predictions
+        scale = torch.tensor([im_width, im_height,
+                              im_width, im_height],
+                             dtype=torch.float32, device=scores.device)
+
+        boxes = decode(loc[inds], priors[inds], self.cfg['variance'])
+        boxes = boxes * scale / resize
+
+        scale_landm = scale[:2].repeat(5)
+        landms_decoded = decode_landm(landms[inds],
+                                      priors[inds],
+                                      self.cfg['variance'])
+        landms_decoded = landms_decoded * scale_landm / resize
+
+        # Apply NMS
+        keep = self.nms(boxes, scores, self.nms_threshold)
+
+        # Keep top-K after NMS
+        keep = keep[:self.keep_top_k]
+
+        dets = torch.cat((boxes[keep], scores[keep].unsqueeze(1)), dim=1)
+        return dets.cpu().numpy(), landms_decoded[keep].cpu().numpy()
 
     def detect_single(self, img, return_aligned=True, save_results=False, save_dir="aligned_faces"):
         """
         Detect faces in a single image.
 
+        The image geometry and prior boxes are derived from ``img`` on every
+        call and kept as local state, so one detector can be shared by
+        several request threads (see the class docstring). Large images are
+        downscaled for the network according to ``max_size``/``size_bucket``;
+        returned coordinates always refer to the original ``img``.
+
         Args:
-            img (np.ndarray): Input image (BGR format)
+            img (np.ndarray): Input image (BGR format), any size
             return_aligned (bool): Return aligned faces
             save_results (bool): Save detection results to disk
             save_dir (str): Directory to save results
@@ -151,55 +451,20 @@ class FaceDetector:
                 - scores: List of confidence scores
                 - landmarks: List of facial landmarks
         """
-        img_tensor = self._preprocess(img)
+        net_img, resize = self._resize_for_detection(img)
+        im_height, im_width = self._canvas_size(*net_img.shape[:2])
+        priors = self.get_prior_box(im_height, im_width)
+
+        img_tensor = self._preprocess([net_img], im_height, im_width)
 
         # Forward pass
         with torch.no_grad():
             loc, conf, landms = self.net(img_tensor)
 
-        # Decode predictions
-        scale = torch.Tensor([self.im_width, self.im_height,
-                              self.im_width, self.im_height]).to(self.device)
-
-        boxes = decode(loc.data.squeeze(0), self.prior_data, self.cfg['variance'])
-        boxes = boxes * scale / self.resize
-        boxes = boxes.cpu().numpy()
-
-        scores = conf.squeeze(0).data.cpu().numpy()[:, 1]
-
-        scale_landm = torch.Tensor([
-            self.im_width, self.im_height, self.im_width, self.im_height,
-            self.im_width, self.im_height, self.im_width, self.im_height,
-            self.im_width, self.im_height
-        ]).to(self.device)
-
-        landms_decoded = decode_landm(landms.data.squeeze(0),
-                                      self.prior_data,
-                                      self.cfg['variance'])
-        landms_decoded = landms_decoded * scale_landm / self.resize
-        landms_decoded = landms_decoded.cpu().numpy()
-
-        # Filter by confidence
-        inds = np.where(scores > self.confidence_threshold)[0]
-        boxes = boxes[inds]
-        landms_decoded = landms_decoded[inds]
-        scores = scores[inds]
-
-        # Keep top-K before NMS
-        order = scores.argsort()[::-1][:self.top_k]
-        boxes = boxes[order]
-        landms_decoded = landms_decoded[order]
-        scores = scores[order]
-
-        # Apply NMS
-        dets = np.hstack((boxes, scores[:, np.newaxis])).astype(np.float32)
-        keep = py_cpu_nms(dets, self.nms_threshold)
-        dets = dets[keep, :]
-        landms_decoded = landms_decoded[keep]
-
-        # Keep top-K after NMS
-        dets = dets[:self.keep_top_k, :]
-        landms_decoded = landms_decoded[:self.keep_top_k, :]
+        dets, landms_decoded = self._postprocess(
+            loc.squeeze(0), conf.squeeze(0), landms.squeeze(0),
+            priors, im_height, im_width, resize
+        )
 
         # Process results
         faces = []
@@ -210,23 +475,20 @@ class FaceDetector:
         if save_results:
             os.makedirs(save_dir, exist_ok=True)
 
-        for i, (det, landm) in enumerate(zip(dets, landms_decoded)):
+        for det, landm in zip(dets, landms_decoded):
             score = det[4]
             if score < self.vis_threshold:
                 continue
 
-            box = det[:4].astype(int)
-            landmarks = landm.reshape(5, 2)
-
-            valid_boxes.append(box)
+            valid_boxes.append(det[:4].astype(int))
             valid_scores.append(score)
-            valid_landmarks.append(landmarks)
+            valid_landmarks.append(landm.reshape(5, 2))
 
-            if return_aligned:
-                aligned_face = self.align_face(img, landmarks)
-                faces.append(aligned_face)
+        if return_aligned:
+            faces = self.align_faces(img, valid_landmarks)
 
-                if save_results:
+            if save_results:
+                for i, (box, aligned_face) in enumerate(zip(valid_boxes, faces)):
                     # Save raw crop
                     x1, y1, x2, y2 = box
                     cropped_raw = img[y1:y2, x1:x2]
@@ -239,6 +501,12 @@ class FaceDetector:
         """
         Detect faces in a batch of images.
 
+        Images may have different sizes. Each one goes through the resize
+        front-end, then all of them are padded on the bottom/right to a common
+        canvas and run in one forward pass. Padding does not shift the
+        top-left origin, so detections are decoded per image on the canvas
+        geometry and mapped back with each image's own resize factor.
+
         Args:
             batch_imgs (list): List of input images (BGR format)
 
@@ -250,13 +518,20 @@ class FaceDetector:
                 - 'landmarks': facial landmarks
                 - 'image_idx': index of source image in batch
         """
-        # Preprocess batch
-        batch_tensors = []
-        for img in batch_imgs:
-            img_tensor = self._preprocess(img)
-            batch_tensors.append(img_tensor)
+        if not batch_imgs:
+            return []
+
+        resized = [self._resize_for_detection(img) for img in batch_imgs]
 
-        batch = torch.cat(batch_tensors, dim=0)
+        # Common canvas for the whole batch
+        im_height, im_width = self._canvas_size(
+            max(net_img.shape[0] for net_img, _ in resized),
+            max(net_img.shape[1] for net_img, _ in resized)
+        )
+        priors = self.get_prior_box(im_height, im_width)
+
+        # Preprocess batch
+        batch = self._preprocess([net_img for net_img, _ in resized], im_height, im_width)
 
         # Forward pass
         with torch.no_grad():
@@ -265,60 +540,25 @@ class FaceDetector:
         # Process each image in batch
         batch_results = []
 
-        for img_idx, (loc, conf, landm, img) in enumerate(
-                zip(all_loc, all_conf, all_landms, batch_imgs)
+        for img_idx, (loc, conf, landm, img, (_, resize)) in enumerate(
+                zip(all_loc, all_conf, all_landms, batch_imgs, resized)
         ):
-            # Decode predictions
-            scale = torch.Tensor([self.im_width, self.im_height,
-                                  self.im_width, self.im_height]).to(self.device)
-
-            boxes = decode(loc.squeeze(0), self.prior_data, self.cfg['variance'])
-            boxes = boxes * scale / self.resize
-            boxes = boxes.detach().cpu().numpy()
-
-            scores = conf.squeeze(0).data.detach().cpu().numpy()[:, 1]
-
-            scale_landm = torch.Tensor([
-                self.im_width, self.im_height, self.im_width, self.im_height,
-                self.im_width, self.im_height, self.im_width, self.im_height,
-                self.im_width, self.im_height
-            ]).to(self.device)
-
-            landms_decoded = decode_landm(landm.squeeze(0),
-                                          self.prior_data,
-                                          self.cfg['variance'])
-            landms_decoded = landms_decoded * scale_landm / self.resize
-            landms_decoded = landms_decoded.detach().cpu().numpy()
-
-            # Filter and NMS
-            inds = np.where(scores > self.confidence_threshold)[0]
-            boxes = boxes[inds]
-            landms_decoded = landms_decoded[inds]
-            scores = scores[inds]
-
-            order = scores.argsort()[::-1][:self.top_k]
-            boxes = boxes[order]
-            landms_decoded = landms_decoded[order]
-            scores = scores[order]
-
-            dets = np.hstack((boxes, scores[:, np.newaxis])).astype(np.float32)
-            keep = py_cpu_nms(dets, self.nms_threshold)
-            dets = dets[keep, :]
-            landms_decoded = landms_decoded[keep]
-
-            dets = dets[:self.keep_top_k, :]
-            landms_decoded = landms_decoded[:self.keep_top_k, :]
+            dets, landms_decoded = self._postprocess(
+                loc, conf, landm, priors, im_height, im_width, resize
+            )
 
             # Create face dictionaries
-            for det, landm in zip(dets, landms_decoded):
-                if det[4] < self.vis_threshold:
-                    continue
+            valid = dets[:, 4] >= self.vis_threshold
+            dets = dets[valid]
+            landmarks = landms_decoded[valid].reshape(-1, 5, 2)
+            aligned_faces = self.align_faces(img, landmarks)
 
+            for det, landm, aligned_face in zip(dets, landmarks, aligned_faces):
                 face_dict = {
                     'box': det[:4].astype(int),
                     'score': det[4],
-                    'landmarks': landm.reshape(5, 2),
-                    'img': self.align_face(img, landm.reshape(5, 2)),
+                    'landmarks': landm,
+                    'img': aligned_face,
                     'image_idx': img_idx
                 }
                 batch_results.append(face_dict)
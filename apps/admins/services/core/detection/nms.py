@@ -0,0 +1,100 @@
+import numpy as np
+import torch
+
+from apps.admins.services.core.detection.py_cpu_nms import py_cpu_nms
+
+try:
+    from torchvision.ops import batched_nms
+except ImportError:  # torchvision is optional for detection
+    batched_nms = None
+
+
+def numpy_nms(boxes, scores, thresh, idxs=None):
+    """
+    NMS backed by the NumPy ``py_cpu_nms`` loop.
+
+    Only the candidate boxes are copied to the host; the kept indices are
+    returned on the device of ``boxes``.
+
+    Args:
+        boxes (torch.Tensor): Boxes [N, 4] of (x1, y1, x2, y2)
+        scores (torch.Tensor): Scores [N]
+        thresh (float): IoU threshold
+        idxs (torch.Tensor): Optional group id per box [N]; boxes from
+            different groups never suppress each other
+
+    Returns:
+        torch.Tensor: Indices of kept boxes, sorted by decreasing score
+    """
+    if boxes.numel() == 0:
+        return torch.empty(0, dtype=torch.int64, device=boxes.device)
+
+    dets = torch.cat((boxes, scores.unsqueeze(1)), dim=1).float().cpu().numpy()
+
+    if idxs is None:
+        keep = np.asarray(py_cpu_nms(dets, thresh), dtype=np.int64)
+    else:
+        groups = idxs.cpu().numpy()
+        keep = []
+        for group in np.unique(groups):
+            members = np.where(groups == group)[0]
+            keep.extend(members[py_cpu_nms(dets[members], thresh)])
+        keep = np.asarray(keep, dtype=np.int64)
+        keep = keep[np.argsort(-dets[keep, 4], kind='stable')]
+
+    return torch.from_numpy(keep).to(boxes.device)
+
+
+def torchvision_nms(boxes, scores, thresh, idxs=None):
+    """
+    NMS backed by ``torchvision.ops.batched_nms``, run on the boxes' device.
+
+    Boxes use the same inclusive pixel convention as ``py_cpu_nms``
+    (width = x2 - x1 + 1), so both backends keep the same detections.
+
+    Args:
+        boxes (torch.Tensor): Boxes [N, 4] of (x1, y1, x2, y2)
+        scores (torch.Tensor): Scores [N]
+        thresh (float): IoU threshold
+        idxs (torch.Tensor): Optional group id per box [N]; boxes from
+            different groups never suppress each other
+
+    Returns:
+        torch.Tensor: Indices of kept boxes, sorted by decreasing score
+    """
+    if boxes.numel() == 0:
+        return torch.empty(0, dtype=torch.int64, device=boxes.device)
+
+    boxes = boxes.float().clone()
+    boxes[:, 2:] += 1
+    if idxs is None:
+        idxs = torch.zeros(len(boxes), dtype=torch.int64, device=boxes.device)
+    return batched_nms(boxes, scores.float(), idxs, thresh)
+
+
+NMS_BACKENDS = {
+    'numpy': numpy_nms,
+    'torchvision': torchvision_nms,
+}
+
+
+def get_nms(backend='auto'):
+    """
+    Resolve an NMS backend by name.
+
+    Args:
+        backend (str): 'auto', 'torchvision' or 'numpy'. 'auto' uses
+            torchvision when it is installed and falls back to NumPy.
+
+    Returns:
+        callable: ``nms(boxes, scores, thresh, idxs=None) -> keep``
+    """
+    if backend == 'auto':
+        backend = 'torchvision' if batched_nms is not None else 'numpy'
+
+    if backend not in NMS_BACKENDS:
+        raise ValueError(f"Unknown NMS backend: {backend}")
+    if backend == 'torchvision' and batched_nms is None:
+        raise ValueError("NMS backend 'torchvision' requires torchvision")
+
+    return NMS_BACKENDS[backend]
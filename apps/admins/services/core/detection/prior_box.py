@@ -1,5 +1,4 @@
 import torch
-from itertools import product as product
 import numpy as np
 from math import ceil
 
@@ -15,20 +14,28 @@ class PriorBox(object):
         self.name = "s"
 
     def forward(self):
+        # Vectorized version of the original (row, col, min_size) triple loop.
+        # Anchors keep the same ordering: row-major over the feature map,
+        # then one anchor per min_size. Computed in float64 like the Python
+        # loop did, then cast to float32.
         anchors = []
         for k, f in enumerate(self.feature_maps):
-            min_sizes = self.min_sizes[k]
-            for i, j in product(range(f[0]), range(f[1])):
-                for min_size in min_sizes:
-                    s_kx = min_size / self.image_size[1]
-                    s_ky = min_size / self.image_size[0]
-                    dense_cx = [x * self.steps[k] / self.image_size[1] for x in [j + 0.5]]
-                    dense_cy = [y * self.steps[k] / self.image_size[0] for y in [i + 0.5]]
-                    for cy, cx in product(dense_cy, dense_cx):
-                        anchors += [cx, cy, s_kx, s_ky]
+            min_sizes = np.asarray(self.min_sizes[k], dtype=np.float64)
+            cx = (np.arange(f[1], dtype=np.float64) + 0.5) * self.steps[k] / self.image_size[1]
+            cy = (np.arange(f[0], dtype=np.float64) + 0.5) * self.steps[k] / self.image_size[0]
+            grid_cx, grid_cy = np.meshgrid(cx, cy)  # (rows, cols)
+
+            num_cells = f[0] * f[1]
+            num_sizes = len(min_sizes)
+            level = np.empty((num_cells, num_sizes, 4), dtype=np.float64)
+            level[:, :, 0] = grid_cx.reshape(-1, 1)
+            level[:, :, 1] = grid_cy.reshape(-1, 1)
+            level[:, :, 2] = min_sizes / self.image_size[1]
+            level[:, :, 3] = min_sizes / self.image_size[0]
+            anchors.append(level.reshape(-1, 4))
 
         # back to torch land
-        output = torch.Tensor(anchors).view(-1, 4)
+        output = torch.from_numpy(np.concatenate(anchors).astype(np.float32))
         if self.clip:
             output.clamp_(max=1, min=0)
-        return output
\ No newline at end of file
+        return output
@@ -0,0 +1,79 @@
+"""
+Export of the face models to TorchScript and ONNX for ``runtime.load_exported``.
+
+Usage:
+    python manage.py export_face_models [--format torchscript] [--format onnx]
+"""
+import torch
+
+from apps.admins.services.core import runtime
+
+DETECTOR_EXAMPLE_SHAPE = (1, 3, 640, 640)
+RECOGNIZER_EXAMPLE_SHAPE = (2, 3, 112, 112)
+
+
+def export_model(model, example_input, weight_path, formats, output_names, dynamic_axes):
+    """
+    Trace an eager model and write it next to its weights.
+
+    Args:
+        model (nn.Module): Float eager model in eval mode
+        example_input (torch.Tensor): Tracing input
+        weight_path (str): Weights of ``model``, used to name the exports
+        formats (iterable): 'torchscript' and/or 'onnx'
+        output_names (list): Names of the model outputs (ONNX)
+        dynamic_axes (dict): Dynamic axes per input/output name (ONNX)
+
+    Returns:
+        dict: {format: written path}
+    """
+    model = model.cpu().eval()
+    example_input = example_input.cpu()
+    paths = {}
+
+    with torch.no_grad():
+        if 'torchscript' in formats:
+            path = runtime.export_path(weight_path, 'torchscript')
+            traced = torch.jit.freeze(torch.jit.trace(model, example_input))
+            torch.jit.save(traced, path)
+            paths['torchscript'] = path
+
+        if 'onnx' in formats:
+            path = runtime.export_path(weight_path, 'onnx')
+            torch.onnx.export(
+                model, (example_input,), path,
+                input_names=['input'],
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False
+            )
+            paths['onnx'] = path
+
+    return paths
+
+
+def export_detector(detector, formats):
+    """Export the RetinaFace network of an eager FaceDetector; inputs of any size."""
+    return export_model(
+        detector.net, torch.zeros(DETECTOR_EXAMPLE_SHAPE), detector.weight_path, formats,
+        output_names=['loc', 'conf', 'landms'],
+        dynamic_axes={
+            'input': {0: 'batch', 2: 'height', 3: 'width'},
+            'loc': {0: 'batch', 1: 'priors'},
+            'conf': {0: 'batch', 1: 'priors'},
+            'landms': {0: 'batch', 1: 'priors'},
+        }
+    )
+
+
+def export_recognizer(recognizer, formats):
+    """Export the GhostFaceNetsV2 model of an eager FaceRecognition; any batch size."""
+    return export_model(
+        recognizer.model, torch.zeros(RECOGNIZER_EXAMPLE_SHAPE), recognizer.weight_path, formats,
+        output_names=['embedding'],
+        dynamic_axes={
+            'input': {0: 'batch'},
+            'embedding': {0: 'batch'},
+        }
+    )
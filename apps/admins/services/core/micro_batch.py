@@ -0,0 +1,98 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching of work submitted from concurrent callers.
+
+    Each caller submits a list of items and gets a ``Future``. A single
+    worker thread waits for the first request, then keeps collecting
+    requests for up to ``max_wait_ms`` or until ``max_batch_size`` items are
+    pending, runs ``process_fn`` once on the concatenated items and resolves
+    every caller's future with its own slice of the output.
+
+    Requests larger than ``max_batch_size`` are never split; they simply
+    form a batch of their own.
+
+    Args:
+        process_fn (callable): ``process_fn(items) -> outputs`` where
+            ``outputs`` supports ``len`` and slicing and has one entry per item
+        max_batch_size (int): Maximum number of items per batch
+        max_wait_ms (float): How long to wait for more requests once the
+            first one arrived
+        name (str): Name of the worker thread
+    """
+
+    def __init__(self, process_fn, max_batch_size=32, max_wait_ms=5.0, name='micro-batcher'):
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, items):
+        """
+        Queue items for the next batch.
+
+        Args:
+            items (list): Items processed together with other callers' items
+
+        Returns:
+            Future: Resolves to the outputs for ``items``, in order
+        """
+        future = Future()
+        items = list(items)
+        if not items:
+            future.set_result([])
+            return future
+        self._queue.put((items, future))
+        return future
+
+    def __call__(self, items):
+        """Submit items and block until their outputs are ready."""
+        return self.submit(items).result()
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out."""
+        batch = [self._queue.get()]
+        pending = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while pending < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            pending += len(request[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(items, future) for items, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            all_items = [item for items, _ in batch for item in items]
+            try:
+                outputs = self.process_fn(all_items)
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for items, future in batch:
+                end = start + len(items)
+                future.set_result(outputs[start:end])
+                start = end
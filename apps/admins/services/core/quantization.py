@@ -0,0 +1,115 @@
+"""
+Post-training static INT8 quantization (FX graph mode) for the CPU path.
+
+A float module is traced with ``prepare_fx``, calibrated on real inputs and
+converted with ``convert_fx``. Only the converted ``state_dict`` is cached
+on disk: loading re-traces the float module into the same quantized graph
+(no calibration) and restores the cached weights and quantization params.
+"""
+import copy
+import os
+import warnings
+
+import cv2
+import torch
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def get_engine(engine=None):
+    """
+    Resolve and activate the quantized kernel backend.
+
+    Args:
+        engine (str): 'x86', 'fbgemm' or 'qnnpack'; None picks the first
+            supported of x86 / fbgemm / qnnpack
+
+    Returns:
+        str: The active engine
+    """
+    supported = torch.backends.quantized.supported_engines
+    if engine is None:
+        engine = next(e for e in ('x86', 'fbgemm', 'qnnpack') if e in supported)
+    if engine not in supported:
+        raise ValueError(f"Quantization engine '{engine}' is not supported, expected one of {supported}")
+
+    torch.backends.quantized.engine = engine
+    return engine
+
+
+def cache_path(weight_path, engine, suffix=''):
+    """Path of the INT8 cache next to the float weights, e.g. ``model.int8-x86.pt``."""
+    root, _ = os.path.splitext(weight_path)
+    return f"{root}{suffix}.int8-{engine}.pt"
+
+
+def _convertible(module, example_input, engine):
+    module = copy.deepcopy(module).eval()
+    # Quantized activations have no in-place kernels (and warn on every call)
+    for submodule in module.modules():
+        if getattr(submodule, 'inplace', False) is True:
+            submodule.inplace = False
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return prepare_fx(module, get_default_qconfig_mapping(engine), (example_input,))
+
+
+def quantize(module, example_input, calibration_inputs, engine):
+    """
+    Calibrate and convert a float module to INT8.
+
+    Args:
+        module (nn.Module): Float module (left untouched)
+        example_input (torch.Tensor): Input used to trace the module
+        calibration_inputs (iterable): Input batches for activation ranges
+        engine (str): Quantization engine
+
+    Returns:
+        torch.fx.GraphModule: Quantized module
+    """
+    prepared = _convertible(module, example_input, engine)
+    with torch.no_grad():
+        for batch in calibration_inputs:
+            prepared(batch)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return convert_fx(prepared)
+
+
+def save(quantized, path):
+    torch.save(quantized.state_dict(), path)
+
+
+def load(module, example_input, path, engine):
+    """
+    Rebuild a quantized module from its cached ``state_dict``.
+
+    Returns:
+        torch.fx.GraphModule or None if there is no cache at ``path``
+    """
+    if not os.path.exists(path):
+        return None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        quantized = convert_fx(_convertible(module, example_input, engine))
+    quantized.load_state_dict(torch.load(path, map_location='cpu'))
+    return quantized.eval()
+
+
+def read_images(folder, limit=None):
+    """BGR images of a calibration folder, sorted by name."""
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(os.path.join(folder, name))
+        if img is not None:
+            images.append(img)
+        if limit and len(images) >= limit:
+            break
+    return images
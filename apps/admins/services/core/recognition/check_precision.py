@@ -0,0 +1,119 @@
+"""
+Accuracy/speed check of the recognizer precision modes against fp32.
+
+Embeds a fixed set of faces with every precision/memory-format mode the
+device supports and reports, per mode, the latency and how far the
+embeddings and the face-to-face distances drift from the fp32 baseline,
+including how many same/different decisions flip at the matching threshold.
+
+Usage:
+    python -m apps.admins.services.core.recognition.check_precision FACE_DIR [--device cpu]
+
+FACE_DIR holds face photos; 112x112 images are used as already aligned
+faces, anything else goes through FaceDetector first.
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from apps.admins.services.core.recognition.rec import PRECISIONS, WEIGHT_PATH, FaceRecognition
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_faces(face_dir, image_size=112, device='cpu'):
+    """Aligned faces from every image in face_dir (sorted, so the set is fixed)."""
+    faces = []
+    detector = None
+
+    for name in sorted(os.listdir(face_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(os.path.join(face_dir, name))
+        if img is None:
+            continue
+
+        if img.shape[:2] == (image_size, image_size):
+            faces.append(img)
+            continue
+
+        if detector is None:
+            from apps.admins.services.core.detection.detec import FaceDetector
+            detector = FaceDetector(device=device)
+        aligned, _, _, _ = detector.detect_single(img)
+        faces.extend(aligned)
+
+    return faces
+
+
+def embed(recognizer, faces, repeat):
+    recognizer.extract_features(faces[:recognizer.batch_size])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        features = torch.cat([
+            recognizer.extract_features(faces[i:i + recognizer.batch_size])
+            for i in range(0, len(faces), recognizer.batch_size)
+        ])
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, features.cpu().numpy()
+
+
+def pairwise_distances(features):
+    diff = features[:, None, :] - features[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def main(face_dir, device=None, weight_path=WEIGHT_PATH, threshold=0.85, repeat=5):
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    faces = load_faces(face_dir, device=device)
+    if not faces:
+        print(f"No faces found in {face_dir}")
+        return
+
+    print(f"Precision check: {len(faces)} faces, device {device}, threshold {threshold}, {repeat} runs")
+
+    baseline = None
+    for precision in PRECISIONS:
+        for channels_last in (False, True):
+            recognizer = FaceRecognition(
+                weight_path=weight_path, device=device,
+                precision=precision, channels_last=channels_last
+            )
+            label = f"{precision}{' channels_last' if channels_last else ''}"
+            if recognizer.precision != precision:
+                print(f"  {label:20s} skipped (not supported on {device})")
+                continue
+
+            elapsed, features = embed(recognizer, faces, repeat)
+            distances = pairwise_distances(features)
+
+            if baseline is None:
+                baseline = features, distances
+                print(f"  {label:20s} {elapsed * 1000:9.2f} ms  (baseline)")
+                continue
+
+            base_features, base_distances = baseline
+            embedding_drift = np.linalg.norm(features - base_features, axis=1)
+            distance_drift = np.abs(distances - base_distances)
+            flipped = ((distances < threshold) != (base_distances < threshold)).sum() // 2
+            print(
+                f"  {label:20s} {elapsed * 1000:9.2f} ms  "
+                f"embedding drift max {embedding_drift.max():.5f}  "
+                f"distance drift max {distance_drift.max():.5f}  "
+                f"decisions flipped {flipped}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('face_dir')
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--weights', default=WEIGHT_PATH)
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.face_dir, args.device, args.weights, args.threshold, args.repeat)
@@ -2,14 +2,20 @@ import cv2
 import numpy as np
 import torch
 import os
+from contextlib import nullcontext
 import torch.nn.functional as F
 from torchvision import transforms
 import ast
-from apps.admins.services.core.recognition.ghostfacenetsv2 import GhostFaceNetsV2
+from apps.admins.services.core import quantization, runtime, similarity
+from apps.admins.services.core.micro_batch import MicroBatcher
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))  # thư mục detection
 CORE_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))  # sang thư mục core
 WEIGHT_PATH = os.path.join(CORE_DIR, "weights", "0.9988571428571429.pt")
+
+PRECISIONS = ('fp32', 'fp16', 'bf16', 'int8')
+
+
 class FaceRecognition:
     """
     Face recognition using GhostFaceNetsV2 model.
@@ -23,6 +29,23 @@ class FaceRecognition:
         width (float): Model width multiplier (default: 1.3)
         dropout (float): Dropout rate (default: 0.2)
         use_flip (bool): Use horizontal flip augmentation (default: True)
+        micro_batch (bool): Collect faces from concurrent ``extract_features``
+            callers into shared forward passes (default: False)
+        max_wait_ms (float): How long a micro-batch waits for more callers
+            once the first one arrived (default: 5)
+        precision (str): 'fp32', 'fp16' (CUDA autocast via the model's own
+            ``fp16`` flag), 'bf16' (autocast on CPU or CUDA) or 'int8' (CPU,
+            static INT8 model cached by ``calibrate_int8``). Modes the device
+            cannot run, or 'int8' without a cache, fall back to 'fp32'
+            (default: 'fp32')
+        channels_last (bool): Run the model in channels-last memory format
+            (default: False)
+        quantization_engine (str): Quantized kernel backend for 'int8', see
+            ``quantization.get_engine`` (default: None)
+        backend (str): 'torch' (eager GhostFaceNetsV2), 'torchscript' or
+            'onnx' (files from ``manage.py export_face_models``, see
+            ``runtime.load_exported``). Exported models run in fp32 and
+            'onnx' runs on CPU (default: 'torch')
     """
 
     def __init__(
@@ -34,13 +57,30 @@ class FaceRecognition:
             image_size=112,
             width=1.3,
             dropout=0.2,
-            use_flip=True
+            use_flip=True,
+            micro_batch=False,
+            max_wait_ms=5.0,
+            precision='fp32',
+            channels_last=False,
+            quantization_engine=None,
+            backend='torch'
     ):
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+        if backend == 'onnx' and torch.device(self.device).type != 'cpu':
+            print(f"ONNX backend runs on CPU, ignoring device {self.device}")
+            self.device = 'cpu'
+        if backend != 'torch' and precision != 'fp32':
+            print(f"Backend '{backend}' runs the exported fp32 model, ignoring precision '{precision}'")
+            precision = 'fp32'
+        self.backend = backend
         self.batch_size = batch_size
         self.threshold = threshold
         self.image_size = image_size
         self.use_flip = use_flip
+        self.precision = self._resolve_precision(precision)
+        self.channels_last = channels_last and self.precision != 'int8' and backend == 'torch'
+        self.quantization_engine = quantization_engine
+        self.weight_path = weight_path
 
         # Initialize model
         self.model = self._load_model(weight_path, image_size, width, dropout)
@@ -52,27 +92,116 @@ class FaceRecognition:
             transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5]),
         ])
 
+        # Concurrent callers share forward passes of up to batch_size faces
+        self._batcher = None
+        if micro_batch:
+            self._batcher = MicroBatcher(
+                lambda faces: self._extract_features(faces, self.use_flip),
+                max_batch_size=batch_size,
+                max_wait_ms=max_wait_ms,
+                name='face-recognition-batcher'
+            )
+
         # Database of known faces
         self.database = []  # List of dicts with 'id', 'name', 'vector'
         self.database_vectors = None  # Tensor of all vectors
 
     def _load_model(self, weight_path, image_size, width, dropout):
-        """Load GhostFaceNetsV2 model."""
+        """Load GhostFaceNetsV2 model (or its exported version)."""
+        if self.backend != 'torch':
+            model = runtime.load_exported(self.backend, weight_path, self.device)
+            print(f"Loaded {self.backend} model for {weight_path}")
+            return model
+
+        from apps.admins.services.core.recognition.ghostfacenetsv2 import GhostFaceNetsV2
+
         model = GhostFaceNetsV2(
             image_size=image_size,
             width=width,
             dropout=dropout,
-            fp16=False
+            fp16=self.precision == 'fp16'
         )
 
         state_dict = torch.load(weight_path, map_location=self.device)
         model.load_state_dict(state_dict)
         model.to(self.device)
+
+        if self.precision == 'int8':
+            model = self._load_int8_model(model)
+        if self.channels_last:
+            model.to(memory_format=torch.channels_last)
         model.eval()
 
         print(f"Model loaded successfully from {weight_path}")
         return model
 
+    def _resolve_precision(self, precision):
+        """Validate the precision mode against the device, falling back to fp32."""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+
+        device_type = torch.device(self.device).type
+        if precision == 'fp16' and device_type != 'cuda':
+            print(f"fp16 requires CUDA, using fp32 on {self.device}")
+            return 'fp32'
+        if precision == 'int8' and device_type != 'cpu':
+            print(f"int8 runs on CPU only, using fp32 on {self.device}")
+            return 'fp32'
+        if precision == 'bf16' and device_type == 'cuda' and not torch.cuda.is_bf16_supported():
+            print("bf16 is not supported by this GPU, using fp32")
+            return 'fp32'
+        return precision
+
+    def _int8_example_input(self):
+        return torch.zeros(1, 3, self.image_size, self.image_size)
+
+    def _load_int8_model(self, model):
+        """Cached INT8 version of ``model``, or ``model`` itself if there is no cache."""
+        engine = quantization.get_engine(self.quantization_engine)
+        path = quantization.cache_path(self.weight_path, engine)
+        quantized = quantization.load(model, self._int8_example_input(), path, engine)
+        if quantized is None:
+            print(f"No INT8 model at {path}, using fp32 "
+                  f"(run: python manage.py quantize_face_models)")
+            self.precision = 'fp32'
+            return model
+
+        print(f"Loaded INT8 model from {path}")
+        return quantized
+
+    def calibrate_int8(self, faces, engine=None):
+        """
+        Quantize the model to INT8 with ``faces`` as calibration data and
+        write it to the cache loaded by ``precision='int8'``.
+
+        Args:
+            faces (list): Aligned face images (np.ndarray, BGR)
+            engine (str): Quantization engine (default: self.quantization_engine)
+
+        Returns:
+            str: Path of the written cache
+        """
+        if self.precision != 'fp32' or self.backend != 'torch':
+            raise ValueError("calibrate_int8 needs an fp32 eager recognizer (backend='torch')")
+
+        engine = quantization.get_engine(engine or self.quantization_engine)
+        batches = (
+            self._preprocess_batch(faces[i:i + self.batch_size]).cpu()
+            for i in range(0, len(faces), self.batch_size)
+        )
+        quantized = quantization.quantize(self.model.cpu(), self._int8_example_input(), batches, engine)
+        self.model.to(self.device)
+
+        path = quantization.cache_path(self.weight_path, engine)
+        quantization.save(quantized, path)
+        return path
+
+    def _autocast(self):
+        """Autocast context for bf16; fp16 is handled inside GhostFaceNetsV2."""
+        if self.precision == 'bf16':
+            return torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16)
+        return nullcontext()
+
     @staticmethod
     def l2_normalize(tensor, dim=1):
         """
@@ -105,10 +234,42 @@ class FaceRecognition:
 
         return self.transform(face_img)
 
+    def _preprocess_batch(self, faces):
+        """
+        Preprocess a list of face images into a model-ready batch.
+
+        Aligned faces are already ``image_size`` x ``image_size`` BGR, so they
+        are stacked into one uint8 array, reordered to RGB NCHW, moved to the
+        device as uint8 and converted in one vectorized pass: x / 255, then
+        (x - 0.5) / 0.5. This is the same arithmetic as ``self.transform``
+        (ToTensor + Normalize; Resize is a no-op at the target size), so the
+        result is identical to the per-face path. Any other size or channel
+        layout falls back to ``_preprocess_face``.
+
+        Args:
+            faces (list): List of face images (np.ndarray)
+
+        Returns:
+            torch.Tensor: Preprocessed batch [N, 3, image_size, image_size] on the device
+        """
+        target_shape = (self.image_size, self.image_size, 3)
+        if not all(face.shape == target_shape and face.dtype == np.uint8 for face in faces):
+            return torch.stack([self._preprocess_face(face) for face in faces]).to(self.device)
+
+        # NHWC BGR -> contiguous NCHW RGB while still uint8, so the copy and the
+        # float conversion both run over contiguous memory
+        batch = np.ascontiguousarray(np.stack(faces).transpose(0, 3, 1, 2)[:, ::-1])
+        batch = torch.from_numpy(batch).to(self.device)
+        return batch.float().div_(255).sub_(0.5).div_(0.5)
+
     def extract_features(self, faces, use_flip=None):
         """
         Extract feature vectors from face images.
 
+        With ``micro_batch`` enabled, calls using the default ``use_flip``
+        are queued and run together with faces from other threads; each
+        caller still gets only its own rows.
+
         Args:
             faces (list): List of face images (np.ndarray)
             use_flip (bool): Use flip augmentation (default: use class setting)
@@ -122,30 +283,29 @@ class FaceRecognition:
         if not faces:
             return torch.empty(0, 512).to(self.device)  # Empty tensor
 
-        # Preprocess faces
-        face_tensors = []
-        flipped_tensors = []
+        if self._batcher is not None and use_flip == self.use_flip:
+            return self._batcher(faces)
 
-        for face in faces:
-            face_tensor = self._preprocess_face(face)
-            face_tensors.append(face_tensor)
+        return self._extract_features(faces, use_flip)
 
-            if use_flip:
-                flipped_face = cv2.flip(face, 1)  # Horizontal flip
-                flipped_tensor = self._preprocess_face(flipped_face)
-                flipped_tensors.append(flipped_tensor)
+    def _extract_features(self, faces, use_flip):
+        """Run the model once on ``faces`` (and their flips) and L2-normalize."""
+        # Preprocess faces into one batch on the device
+        face_batch = self._preprocess_batch(faces)
+
+        if use_flip:
+            # Horizontal flip of the normalized batch, run in the same forward pass
+            face_batch = torch.cat([face_batch, torch.flip(face_batch, dims=[3])])
 
-        # Stack and move to device
-        face_batch = torch.stack(face_tensors).to(self.device)
+        if self.channels_last:
+            face_batch = face_batch.contiguous(memory_format=torch.channels_last)
 
         # Extract features
-        with torch.no_grad():
-            features = self.model(face_batch)
+        with torch.no_grad(), self._autocast():
+            features = self.model(face_batch).float()
 
             if use_flip:
-                flipped_batch = torch.stack(flipped_tensors).to(self.device)
-                flipped_features = self.model(flipped_batch)
-                features = features + flipped_features
+                features = features.view(2, len(faces), -1).sum(dim=0)
 
         # L2 normalize
         features = self.l2_normalize(features)
@@ -221,12 +381,13 @@ class FaceRecognition:
             return
 
         vectors = [entry['vector'] for entry in self.database]
-        self.database_vectors = torch.stack(vectors).to(self.device)
+        self.database_vectors = similarity.as_gallery(torch.stack(vectors), device=self.device)
         print(f"Database vectors shape: {self.database_vectors.shape}")
 
     def compare_vectors(self, query_vectors, database_vectors=None, threshold=None):
         """
-        Compare query vectors with database vectors using Euclidean distance.
+        Compare query vectors with database vectors using Euclidean distance
+        (computed from cosine similarity, see ``core.similarity``).
 
         Args:
             query_vectors (torch.Tensor): Query vectors [N, D]
@@ -245,23 +406,15 @@ class FaceRecognition:
         if database_vectors is None or len(database_vectors) == 0:
             return torch.zeros(len(query_vectors), 1, dtype=torch.int)
 
-        # Ensure float type
-        query_vectors = query_vectors.float()
-        database_vectors = database_vectors.float()
-
-        # Compute Euclidean distance [N, M]
-        distances = torch.cdist(query_vectors, database_vectors, p=2)
-
-        # Find minimum distance and corresponding index for each query
-        min_dist, min_idx = torch.min(distances, dim=1)
+        if database_vectors.dtype not in similarity.GALLERY_DTYPES:
+            database_vectors = similarity.as_gallery(database_vectors)
 
-        # Initialize result with zeros
-        result = torch.zeros_like(distances, dtype=torch.int)
+        # Nearest database vector of each query (one GEMM on unit vectors)
+        min_dist, min_idx = similarity.nearest(query_vectors, database_vectors)
 
-        # Set 1 only if minimum distance is below threshold
-        for i in range(distances.size(0)):
-            if min_dist[i] < threshold:
-                result[i, min_idx[i]] = 1
+        # Set 1 only where the minimum distance is below threshold
+        result = torch.zeros(len(min_idx), len(database_vectors), dtype=torch.int, device=min_idx.device)
+        result[torch.arange(len(min_idx), device=min_idx.device), min_idx] = (min_dist < threshold).int()
 
         return result
 
@@ -355,9 +508,8 @@ class FaceRecognition:
                 'vector': features[0].cpu()
             }
 
-        # Compute distances
-        distances = torch.cdist(features, self.database_vectors, p=2)
-        min_dist, min_idx = torch.min(distances, dim=1)
+        # Nearest database vector
+        min_dist, min_idx = similarity.nearest(features, self.database_vectors)
 
         min_dist = min_dist.item()
         min_idx = min_idx.item()
@@ -0,0 +1,87 @@
+"""
+Inference backends for the exported face models.
+
+'torch' builds the eager module from its Python class and weights (done by
+FaceDetector/FaceRecognition themselves). 'torchscript' and 'onnx' load
+the files written by ``manage.py export_face_models`` and need neither the
+model classes nor their weights file at runtime.
+"""
+import os
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime
+except ImportError:  # onnxruntime is optional, only needed for the 'onnx' backend
+    onnxruntime = None
+
+BACKENDS = ('torch', 'torchscript', 'onnx')
+EXPORT_EXTENSIONS = {
+    'torchscript': '.ts',
+    'onnx': '.onnx',
+}
+
+
+def export_path(weight_path, backend):
+    """Path of the exported model next to the float weights, e.g. ``model.onnx``."""
+    root, _ = os.path.splitext(weight_path)
+    return root + EXPORT_EXTENSIONS[backend]
+
+
+class OnnxModule:
+    """
+    Callable wrapper of an ONNX Runtime session (CPU execution provider)
+    that takes and returns torch tensors like the eager module it replaces.
+
+    Args:
+        path (str): Path of the .onnx file
+        num_threads (int): Intra-op threads, 0 lets ONNX Runtime decide
+    """
+
+    def __init__(self, path, num_threads=0):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        x = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        outputs = [torch.from_numpy(out) for out in self.session.run(None, {self.input_name: x})]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+    def eval(self):
+        return self
+
+
+def load_exported(backend, weight_path, device='cpu'):
+    """
+    Load an exported model.
+
+    Args:
+        backend (str): 'torchscript' or 'onnx'
+        weight_path (str): Float weights the model was exported from
+        device (str): Device for TorchScript; ONNX always runs on CPU
+
+    Returns:
+        callable: Module taking a float NCHW batch
+
+    Raises:
+        FileNotFoundError: The model has not been exported yet
+        ImportError: 'onnx' without onnxruntime installed
+    """
+    if backend not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    path = export_path(weight_path, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found (run: python manage.py export_face_models)")
+
+    if backend == 'onnx':
+        if onnxruntime is None:
+            raise ImportError("Backend 'onnx' requires onnxruntime")
+        return OnnxModule(path)
+
+    return torch.jit.load(path, map_location=device).eval()
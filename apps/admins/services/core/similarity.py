@@ -0,0 +1,111 @@
+"""
+Similarity kernel for L2-normalized face embeddings.
+
+``FaceRecognition.extract_features`` returns unit vectors, so for a query
+matrix Q (N, D) and a gallery G (M, D) the Euclidean distance follows from
+one GEMM:
+
+    ||q - g||^2 = 2 - 2 * (q . g)   ->   distance = sqrt(2 - 2 * Q @ G.T)
+
+which is what ``torch.cdist`` computes the long way. Galleries are kept
+C-contiguous in float32 or float16 (half the memory, GEMM in half precision
+with results returned as float32); queries are cast to the gallery's dtype
+and device.
+
+Every matching path (attendance batches, 1:1 comparison, FaceRecognition's
+in-memory database) goes through these functions so they agree on the
+distance they threshold.
+"""
+import warnings
+
+import numpy as np
+import torch
+
+GALLERY_DTYPES = (torch.float32, torch.float16)
+
+
+def as_gallery(vectors, dtype=torch.float32, device=None):
+    """
+    Gallery matrix for the kernel.
+
+    Args:
+        vectors: (M, D) array-like, numpy array or tensor of unit vectors
+        dtype (torch.dtype): torch.float32 or torch.float16
+        device: Target device, default the tensor's own (CPU for arrays)
+
+    Returns:
+        torch.Tensor: (M, D) C-contiguous
+    """
+    if dtype not in GALLERY_DTYPES:
+        raise ValueError(f"Gallery dtype {dtype} is not supported, expected one of {GALLERY_DTYPES}")
+
+    if isinstance(vectors, np.ndarray):
+        with warnings.catch_warnings():
+            # Read-only buffers (np.frombuffer, mmap) are shared, never written
+            warnings.simplefilter('ignore', UserWarning)
+            vectors = torch.from_numpy(np.ascontiguousarray(vectors))
+    elif not isinstance(vectors, torch.Tensor):
+        vectors = torch.as_tensor(vectors, dtype=torch.float32)
+    if vectors.dim() == 1:
+        vectors = vectors.unsqueeze(0)
+    return vectors.to(device=device, dtype=dtype).contiguous()
+
+
+def cosine_similarity(queries, gallery):
+    """
+    Cosine similarity of every query against every gallery row.
+
+    Args:
+        queries: (N, D) unit vectors (anything ``as_gallery`` accepts)
+        gallery (torch.Tensor): (M, D) unit vectors from ``as_gallery``
+
+    Returns:
+        torch.Tensor: (N, M) float32 on the gallery's device
+    """
+    queries = as_gallery(queries, dtype=gallery.dtype, device=gallery.device)
+    return (queries @ gallery.T).float()
+
+
+def similarity_to_distance(similarity):
+    """Euclidean distance of unit vectors from their cosine similarity."""
+    return (2.0 - 2.0 * similarity).clamp_(min=0.0).sqrt_()
+
+
+def distances(queries, gallery):
+    """
+    Euclidean distances of unit vectors, same values as
+    ``torch.cdist(queries, gallery, p=2)`` up to rounding.
+
+    Returns:
+        torch.Tensor: (N, M) float32 on the gallery's device
+    """
+    return similarity_to_distance(cosine_similarity(queries, gallery))
+
+
+def topk(queries, gallery, k):
+    """
+    The k nearest gallery rows of every query.
+
+    Args:
+        queries: (N, D) unit vectors
+        gallery (torch.Tensor): (M, D) unit vectors
+        k (int): Number of neighbours, capped at M
+
+    Returns:
+        tuple: (distances, indices), each (N, min(k, M)), closest first
+    """
+    similarity = cosine_similarity(queries, gallery)
+    k = min(k, similarity.shape[1])
+    values, indices = torch.topk(similarity, k, dim=1, largest=True, sorted=True)
+    return similarity_to_distance(values), indices
+
+
+def nearest(queries, gallery):
+    """
+    Nearest gallery row of every query.
+
+    Returns:
+        tuple: (distances, indices), each (N,)
+    """
+    values, indices = topk(queries, gallery, 1)
+    return values[:, 0], indices[:, 0]
@@ -0,0 +1,249 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+
+class CourseGallery:
+    """
+    Embedding của các sinh viên đăng ký một lớp tín chỉ.
+
+    Attributes:
+        course_id (int): Id LopTinChi
+        matrix (np.ndarray): (N, 512) float32 C-contiguous, dòng i là sinh viên i
+        student_ids (np.ndarray): (N,) int64 id SinhVien song song với matrix
+        enrollment_ids (np.ndarray): (N,) int64 id DangKy song song với matrix
+        student_info (dict): {student_id: thông tin sinh viên} cho response
+        enrollment_count (int): Số đăng ký còn hiệu lực (kể cả chưa có embedding)
+    """
+
+    __slots__ = ('course_id', 'matrix', 'student_ids', 'enrollment_ids', 'student_info', 'enrollment_count')
+
+    def __init__(self, course_id, matrix, student_ids, enrollment_ids, student_info, enrollment_count):
+        self.course_id = course_id
+        self.matrix = matrix
+        self.student_ids = student_ids
+        self.enrollment_ids = enrollment_ids
+        self.student_info = student_info
+        self.enrollment_count = enrollment_count
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def load(cls, course_id):
+        """Đọc DangKy/SinhVien/TaiKhoan của lớp và decode embedding một lần"""
+        from apps.admins.services.face_embedding_service import FaceEmbeddingService
+        from apps.my_built_in.models import DangKy
+
+        enrollments = DangKy.objects.filter(
+            course_id=course_id,
+            is_deleted=False
+        ).select_related('student__user')
+
+        vectors, student_ids, enrollment_ids, student_info = [], [], [], {}
+        enrollment_count = 0
+
+        for enrollment in enrollments:
+            enrollment_count += 1
+            student = enrollment.student
+            user = student.user
+            if not user or student.id in student_info:
+                continue
+            vector = FaceEmbeddingService.string_to_vector(user.face_embedding)
+            if vector is None:
+                continue
+
+            vectors.append(vector)
+            student_ids.append(student.id)
+            enrollment_ids.append(enrollment.id)
+            student_info[student.id] = {
+                'enrollment_id': enrollment.id,
+                'student_id': student.id,
+                'student_code': student.student_code,
+                'full_name': f"{user.first_name} {user.last_name}",
+                'email': user.email
+            }
+
+        if vectors:
+            matrix = np.ascontiguousarray(np.stack(vectors), dtype=np.float32)
+        else:
+            matrix = np.empty((0, 512), dtype=np.float32)
+
+        return cls(
+            course_id=course_id,
+            matrix=matrix,
+            student_ids=np.asarray(student_ids, dtype=np.int64),
+            enrollment_ids=np.asarray(enrollment_ids, dtype=np.int64),
+            student_info=student_info,
+            enrollment_count=enrollment_count
+        )
+
+
+class CourseGalleryCache:
+    """
+    Cache LRU theo course_id cho CourseGallery, dùng chung trong process.
+
+    Danh sách sinh viên của một lớp gần như cố định cả học kỳ, nên các lần
+    upload điểm danh liên tiếp lấy ma trận embedding từ bộ nhớ thay vì
+    query MySQL và decode lại từng vector.
+
+    Invalidate bằng signal post_save/post_delete của DangKy, SinhVien,
+    TaiKhoan (apps/my_built_in/signals.py). Signal chỉ chạy trong process
+    đã ghi DB, nên:
+        - COURSE_GALLERY_CACHE_SHARED=false: các worker khác thấy thay đổi
+          sau tối đa COURSE_GALLERY_CACHE_TTL giây
+        - COURSE_GALLERY_CACHE_SHARED=true: mỗi lớp có một version trong
+          Django cache (CACHES['default'], VD Redis/Memcached), invalidate
+          đổi version nên mọi worker thấy ngay; gallery cũng được lưu ở đó
+          để worker khác không phải query lại
+
+    Args:
+        max_size (int): Số lớp tối đa giữ trong process (0 = tắt cache)
+        ttl (float): Số giây một gallery còn hiệu lực (0 = không hết hạn)
+        shared (bool): Dùng Django cache làm tầng chia sẻ giữa các worker
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_size=64, ttl=300, shared=False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()  # course_id -> (gallery, version, loaded_at)
+        self._lock = threading.Lock()
+        # Tăng mỗi lần invalidate: gallery đọc từ DB trước khi invalidate
+        # không được đưa vào cache
+        self._generation = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def get_cache(cls):
+        """Singleton CourseGalleryCache cấu hình từ settings"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(
+                        max_size=getattr(settings, 'COURSE_GALLERY_CACHE_SIZE', 64),
+                        ttl=getattr(settings, 'COURSE_GALLERY_CACHE_TTL', 300),
+                        shared=getattr(settings, 'COURSE_GALLERY_CACHE_SHARED', False)
+                    )
+        return cls._instance
+
+    @classmethod
+    def get_gallery(cls, course_id):
+        return cls.get_cache().get(course_id)
+
+    @classmethod
+    def invalidate_courses(cls, course_ids):
+        cache = cls.get_cache()
+        for course_id in set(course_ids):
+            cache.invalidate(course_id)
+
+    @staticmethod
+    def _version_key(course_id):
+        return f"course-gallery:{course_id}:version"
+
+    @staticmethod
+    def _data_key(course_id, version):
+        return f"course-gallery:{course_id}:{version}"
+
+    def _shared_version(self, course_id):
+        version = shared_cache.get(self._version_key(course_id))
+        if version is None:
+            version = uuid.uuid4().hex
+            # add: không ghi đè version do worker khác vừa tạo
+            if not shared_cache.add(self._version_key(course_id), version, None):
+                version = shared_cache.get(self._version_key(course_id), version)
+        return version
+
+    def _expired(self, loaded_at):
+        return bool(self.ttl) and time.monotonic() - loaded_at > self.ttl
+
+    def get(self, course_id):
+        """
+        Gallery của lớp, đọc DB khi chưa có trong cache.
+
+        Returns:
+            CourseGallery
+        """
+        if not self.max_size:
+            return CourseGallery.load(course_id)
+
+        version = self._shared_version(course_id) if self.shared else None
+
+        with self._lock:
+            entry = self._entries.get(course_id)
+            if entry is not None:
+                gallery, entry_version, loaded_at = entry
+                if entry_version == version and not self._expired(loaded_at):
+                    self._entries.move_to_end(course_id)
+                    self.hits += 1
+                    return gallery
+                del self._entries[course_id]
+            generation = self._generation
+
+        gallery = None
+        if self.shared:
+            gallery = shared_cache.get(self._data_key(course_id, version))
+            if gallery is not None:
+                with self._lock:
+                    self.shared_hits += 1
+
+        if gallery is None:
+            with self._lock:
+                self.misses += 1
+            gallery = CourseGallery.load(course_id)
+            if self.shared:
+                shared_cache.set(self._data_key(course_id, version), gallery, self.ttl or None)
+
+        with self._lock:
+            if generation != self._generation:
+                return gallery
+            self._entries[course_id] = (gallery, version, time.monotonic())
+            self._entries.move_to_end(course_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return gallery
+
+    def invalidate(self, course_id=None):
+        """Bỏ gallery của một lớp (None = tất cả lớp trong process)"""
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            if course_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(course_id, None)
+
+        if self.shared and course_id is not None:
+            shared_cache.set(self._version_key(course_id), uuid.uuid4().hex, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -6,56 +6,126 @@ import base64
 from io import BytesIO
 from PIL import Image
 import os
+import threading
+from django.conf import settings
 
+from apps.admins.services.attendance_frame import AttendanceFrame
+from apps.admins.services.core import assignment, similarity
 from apps.admins.services.core.detection.detec import FaceDetector
 from apps.admins.services.core.recognition.rec import FaceRecognition
 
 
+EMBEDDING_DIM = 512
+EMBEDDING_DTYPES = ('float32', 'float16')
+
+
 class FaceEmbeddingService:
     """
     Service xử lý embedding khuôn mặt cho sinh viên.
     Tích hợp FaceDetector và FaceRecognition để trích xuất và lưu vector đặc trưng.
+
+    Detector và recognizer là singleton dùng chung cho mọi request thread
+    trong một process. Không ghi trạng thái theo request (kích thước ảnh,
+    prior box...) lên các singleton này: detect_single tự lấy kích thước từ ảnh.
     """
 
     _detector = None
     _recognizer = None
+    # Hai request đầu tiên đồng thời không load model hai lần
+    _detector_lock = threading.Lock()
+    _recognizer_lock = threading.Lock()
+
+    @staticmethod
+    def use_inference_server():
+        """Model chạy ở inference server riêng (INFERENCE_BACKEND='server')"""
+        return getattr(settings, 'INFERENCE_BACKEND', 'local') == 'server'
 
     @classmethod
     def get_detector(cls):
-        """Singleton pattern cho FaceDetector"""
+        """Singleton pattern cho FaceDetector (hoặc client tới inference server)"""
         if cls._detector is None:
-            cls._detector = FaceDetector(
-                img_width=1280,
-                img_height=720,
-                device='cuda' if torch.cuda.is_available() else 'cpu',
-                confidence_threshold=0.4,
-                nms_threshold=0.2,
-                vis_threshold=0.9
-            )
+            with cls._detector_lock:
+                if cls._detector is None:
+                    if cls.use_inference_server():
+                        from apps.admins.services.inference_client import RemoteFaceDetector
+                        cls._detector = RemoteFaceDetector()
+                    else:
+                        cls._detector = cls.create_detector()
         return cls._detector
 
     @classmethod
     def get_recognizer(cls):
-        """Singleton pattern cho FaceRecognition"""
+        """Singleton pattern cho FaceRecognition (hoặc client tới inference server)"""
         if cls._recognizer is None:
-            cls._recognizer = FaceRecognition(
-                device='cuda' if torch.cuda.is_available() else 'cpu',
-                batch_size=32,
-                threshold=0.85
-            )
+            with cls._recognizer_lock:
+                if cls._recognizer is None:
+                    if cls.use_inference_server():
+                        from apps.admins.services.inference_client import RemoteFaceRecognition
+                        cls._recognizer = RemoteFaceRecognition()
+                    else:
+                        cls._recognizer = cls.create_recognizer()
         return cls._recognizer
 
+    @staticmethod
+    def create_detector():
+        """Load FaceDetector trong process hiện tại"""
+        return FaceDetector(
+            img_width=1280,
+            img_height=720,
+            device='cuda' if torch.cuda.is_available() else 'cpu',
+            confidence_threshold=0.4,
+            nms_threshold=0.2,
+            vis_threshold=0.9,
+            max_size=getattr(settings, 'FACE_DETECTION_MAX_SIZE', 1280),
+            size_bucket=getattr(settings, 'FACE_DETECTION_SIZE_BUCKET', 32),
+            quantized=getattr(settings, 'FACE_DETECTION_INT8', False),
+            quantization_engine=getattr(settings, 'QUANTIZATION_ENGINE', None),
+            backend=getattr(settings, 'FACE_MODEL_BACKEND', 'torch')
+        )
+
+    @staticmethod
+    def create_recognizer():
+        """Load FaceRecognition trong process hiện tại"""
+        return FaceRecognition(
+            device='cuda' if torch.cuda.is_available() else 'cpu',
+            batch_size=32,
+            threshold=0.85,
+            micro_batch=getattr(settings, 'FACE_RECOGNITION_MICRO_BATCH', False),
+            max_wait_ms=getattr(settings, 'FACE_RECOGNITION_MAX_WAIT_MS', 5),
+            precision=getattr(settings, 'FACE_RECOGNITION_PRECISION', 'fp32'),
+            channels_last=getattr(settings, 'FACE_RECOGNITION_CHANNELS_LAST', False),
+            quantization_engine=getattr(settings, 'QUANTIZATION_ENGINE', None),
+            backend=getattr(settings, 'FACE_MODEL_BACKEND', 'torch')
+        )
+
+    @classmethod
+    def use_local_models(cls):
+        """
+        Load model trong process hiện tại và dùng làm singleton, bỏ qua
+        INFERENCE_BACKEND. Dùng cho chính inference server.
+
+        Returns:
+            tuple: (detector, recognizer)
+        """
+        cls._detector = cls.create_detector()
+        cls._recognizer = cls.create_recognizer()
+        return cls._detector, cls._recognizer
+
     @staticmethod
     def read_image_file(image_file):
         """
         Đọc file ảnh từ Django UploadedFile.
 
         Args:
-            image_file: Django UploadedFile object
+            image_file: Django UploadedFile object hoặc AttendanceFrame
+                (đã decode sẵn, trả về luôn ảnh của frame)
 
         Returns:
             np.ndarray: OpenCV image (BGR format)
         """
+        if isinstance(image_file, AttendanceFrame):
+            return image_file.image
+
         try:
             # Đọc file thành bytes
             image_bytes = image_file.read()
@@ -95,19 +165,22 @@ class FaceEmbeddingService:
         return img
 
     @classmethod
-    def extract_face_embedding(cls, image_file=None, image_path=None):
+    def extract_face_embedding(cls, image_file=None, image_path=None, img=None):
         """
         Trích xuất vector embedding từ ảnh khuôn mặt.
 
         Args:
             image_file: Django UploadedFile (nếu upload từ form)
             image_path (str): Đường dẫn file ảnh (nếu đã lưu)
+            img (np.ndarray): Ảnh đã decode sẵn (BGR), dùng chung với các
+                service khác để không phải decode lại file upload
 
         Returns:
             dict: {
                 'success': bool,
                 'vector': list hoặc None,
                 'vector_str': str (JSON string) hoặc None,
+                'vector_bytes': bytes (lưu vector_embedding_bin, khi success),
                 'face_count': int,
                 'message': str,
                 'aligned_face': np.ndarray (optional)
@@ -115,7 +188,9 @@ class FaceEmbeddingService:
         """
         try:
             # Đọc ảnh
-            if image_file:
+            if img is not None:
+                pass
+            elif image_file:
                 img = cls.read_image_file(image_file)
             elif image_path:
                 img = cls.read_image_from_path(image_path)
@@ -132,11 +207,6 @@ class FaceEmbeddingService:
             detector = cls.get_detector()
             recognizer = cls.get_recognizer()
 
-            # Cập nhật kích thước ảnh cho detector
-            detector.im_height = img.shape[0]
-            detector.im_width = img.shape[1]
-            detector.prior_data = detector._create_prior_box()
-
             # Detect faces
             faces, boxes, scores, landmarks = detector.detect_single(
                 img,
@@ -169,13 +239,15 @@ class FaceEmbeddingService:
             # Convert tensor thành list
             vector = features[0].cpu().numpy().tolist()
 
-            # Convert thành JSON string để lưu vào DB
+            # Convert thành JSON string (trả về API) và bytes (lưu vào DB)
             vector_str = json.dumps(vector)
+            vector_bytes = cls.vector_to_bytes(features[0].cpu().numpy())
 
             return {
                 'success': True,
                 'vector': vector,
                 'vector_str': vector_str,
+                'vector_bytes': vector_bytes,
                 'face_count': 1,
                 'message': 'Face embedding extracted successfully',
                 'aligned_face': aligned_face,
@@ -193,13 +265,15 @@ class FaceEmbeddingService:
             }
 
     @classmethod
-    def extract_multiple_faces(cls, image_file=None, image_path=None):
+    def extract_multiple_faces(cls, image_file=None, image_path=None, img=None):
         """
         Trích xuất tất cả khuôn mặt từ ảnh có nhiều người.
 
         Args:
             image_file: Django UploadedFile (nếu upload từ form)
             image_path (str): Đường dẫn file ảnh (nếu đã lưu)
+            img (np.ndarray): Ảnh đã decode sẵn (BGR), dùng chung với các
+                service khác để không phải decode lại file upload
 
         Returns:
             dict: {
@@ -218,7 +292,9 @@ class FaceEmbeddingService:
         """
         try:
             # Đọc ảnh
-            if image_file:
+            if img is not None:
+                pass
+            elif image_file:
                 img = cls.read_image_file(image_file)
             elif image_path:
                 img = cls.read_image_from_path(image_path)
@@ -234,11 +310,6 @@ class FaceEmbeddingService:
             detector = cls.get_detector()
             recognizer = cls.get_recognizer()
 
-            # Cập nhật kích thước ảnh cho detector
-            detector.im_height = img.shape[0]
-            detector.im_width = img.shape[1]
-            detector.prior_data = detector._create_prior_box()
-
             # Detect faces
             faces, boxes, scores, landmarks = detector.detect_single(
                 img,
@@ -285,6 +356,11 @@ class FaceEmbeddingService:
                 'message': f'Error extracting faces: {str(e)}'
             }
 
+    @staticmethod
+    def get_assignment_method():
+        """Cách ghép khuôn mặt - sinh viên (settings.FACE_MATCH_ASSIGNMENT)"""
+        return getattr(settings, 'FACE_MATCH_ASSIGNMENT', 'hungarian')
+
     @classmethod
     def match_faces_batch(cls, detected_vectors, stored_vectors_dict, threshold=0.95):
         """
@@ -292,83 +368,143 @@ class FaceEmbeddingService:
 
         Args:
             detected_vectors (list): List các vector phát hiện được (dạng list)
-            stored_vectors_dict (dict): Dict {student_id: vector_str}
+            stored_vectors_dict (dict): Dict {student_id: bytes hoặc vector_str}
             threshold (float): Ngưỡng khoảng cách Euclidean (default=0.95)
 
+        Mỗi khuôn mặt ghép tối đa một sinh viên và ngược lại, tối ưu trên
+        toàn bộ ma trận khoảng cách (FACE_MATCH_ASSIGNMENT: 'hungarian'
+        hoặc 'greedy' theo khoảng cách tăng dần).
+
         Returns:
             dict: {
                 'matches': list of dict [
                     {
                         'detected_index': int,
                         'student_id': int,
-                        'distance': float
+                        'distance': float,
+                        'ambiguous': bool (ứng viên thứ hai cách < FACE_MATCH_AMBIGUITY_MARGIN),
+                        'candidates': list [{'student_id', 'distance'}] ứng viên khác
                     }
                 ],
-                'unmatched_indices': list of int
+                'unmatched_indices': list of int,
+                'unmatched_candidates': dict {detected_index: candidates}
             }
         """
         try:
             if not detected_vectors or not stored_vectors_dict:
                 return {
                     'matches': [],
-                    'unmatched_indices': list(range(len(detected_vectors)))
+                    'unmatched_indices': list(range(len(detected_vectors))),
+                    'unmatched_candidates': {}
                 }
 
-            # Convert detected vectors sang tensor
-            detected_tensors = torch.tensor(
-                detected_vectors,
-                dtype=torch.float32
-            )  # Shape: (n_detected, 512)
-
-            # Convert stored vectors sang tensor
+            # Decode stored vectors thành ma trận
             student_ids = []
             stored_tensors_list = []
             
-            for student_id, vector_str in stored_vectors_dict.items():
-                vector = cls.string_to_vector(vector_str)
+            for student_id, stored in stored_vectors_dict.items():
+                vector = cls.string_to_vector(stored)
                 if vector is not None:
                     student_ids.append(student_id)
                     stored_tensors_list.append(vector)
             if not stored_tensors_list:
                 return {
                     'matches': [],
-                    'unmatched_indices': list(range(len(detected_vectors)))
+                    'unmatched_indices': list(range(len(detected_vectors))),
+                    'unmatched_candidates': {}
                 }
 
-            stored_tensors = torch.tensor(
-                stored_tensors_list,
-                dtype=torch.float32
-            )  # Shape: (n_students, 512)
+            # np.stack copy một lần từ các buffer (frombuffer) vào ma trận
+            stored_matrix = np.stack(stored_tensors_list).astype(np.float32, copy=False)
 
-            # Tính ma trận khoảng cách Euclidean
-            # Shape: (n_detected, n_students)
-            distances = torch.cdist(detected_tensors, stored_tensors, p=2)
-            
-            # Tìm student gần nhất cho mỗi khuôn mặt phát hiện
-            min_distances, min_indices = torch.min(distances, dim=1)
-            
-            # Lọc ra các match thỏa mãn threshold
-            matches = []
-            matched_detected_indices = set()
-            matched_student_ids = set()
+        except Exception as e:
+            return {
+                'matches': [],
+                'unmatched_indices': list(range(len(detected_vectors))),
+                'unmatched_candidates': {},
+                'error': str(e)
+            }
+
+        return cls.match_faces_matrix(detected_vectors, stored_matrix, student_ids, threshold)
+
+    @classmethod
+    def match_faces_gallery(cls, detected_vectors, gallery, threshold=0.95):
+        """
+        Như match_faces_batch nhưng với CourseGallery đã cache
+        (ma trận embedding của lớp, không decode lại từng vector).
 
-            for detected_idx, (min_dist, student_idx) in enumerate(
-                    zip(min_distances.tolist(), min_indices.tolist())
+        Args:
+            detected_vectors (list): List các vector phát hiện được
+            gallery (CourseGallery): Gallery của lớp (CourseGalleryCache)
+            threshold (float): Ngưỡng khoảng cách Euclidean (default=0.95)
+        """
+        return cls.match_faces_matrix(
+            detected_vectors, gallery.matrix, gallery.student_ids.tolist(), threshold
+        )
+
+    @classmethod
+    def match_faces_matrix(cls, detected_vectors, stored_matrix, student_ids, threshold=0.95):
+        """
+        So sánh vector phát hiện với ma trận embedding (N, 512).
+
+        Args:
+            detected_vectors (list): List các vector phát hiện được
+            stored_matrix (np.ndarray): (n_students, 512) float32
+            student_ids (list): student_id theo từng dòng của stored_matrix
+            threshold (float): Ngưỡng khoảng cách Euclidean
+
+        Returns:
+            dict: Giống match_faces_batch
+        """
+        try:
+            if not detected_vectors or len(student_ids) == 0:
+                return {
+                    'matches': [],
+                    'unmatched_indices': list(range(len(detected_vectors))),
+                    'unmatched_candidates': {}
+                }
+
+            # Tính ma trận khoảng cách Euclidean bằng một phép nhân ma trận
+            # (embedding đã L2-normalize), Shape: (n_detected, n_students)
+            distances = similarity.distances(
+                detected_vectors, similarity.as_gallery(stored_matrix)
+            )
+
+            # Ghép 1-1 khuôn mặt - sinh viên tối ưu toàn cục (không còn
+            # "ai đến trước được trước" như argmin từng khuôn mặt)
+            face_indices, student_indices = assignment.assign(
+                distances, threshold, method=cls.get_assignment_method()
+            )
+
+            # Ứng viên gần nhất của mỗi khuôn mặt (dưới threshold)
+            margin = getattr(settings, 'FACE_MATCH_AMBIGUITY_MARGIN', 0.05)
+            candidates = [
+                [{'student_id': student_ids[idx], 'distance': dist} for idx, dist in face_candidates]
+                for face_candidates in assignment.top_candidates(
+                    distances, threshold, getattr(settings, 'FACE_MATCH_CANDIDATES', 3)
+                )
+            ]
+            assigned_distances = distances[
+                torch.as_tensor(face_indices), torch.as_tensor(student_indices)
+            ].tolist()
+
+            matches = []
+            for detected_idx, student_idx, distance in zip(
+                    face_indices.tolist(), student_indices.tolist(), assigned_distances
             ):
-                if min_dist < threshold:
-                    student_id = student_ids[student_idx]
-
-                    # Tránh trùng lặp: 1 khuôn mặt chỉ match 1 sinh viên
-                    if student_id not in matched_student_ids:
-                        matches.append({
-                            'detected_index': detected_idx,
-                            'student_id': student_id,
-                            'distance': float(min_dist)
-                        })
-                        matched_detected_indices.add(detected_idx)
-                        matched_student_ids.add(student_id)
+                student_id = student_ids[student_idx]
+                runner_ups = [c for c in candidates[detected_idx] if c['student_id'] != student_id]
+                matches.append({
+                    'detected_index': detected_idx,
+                    'student_id': student_id,
+                    'distance': float(distance),
+                    # Mơ hồ: ứng viên khác gần gần bằng sinh viên được ghép
+                    'ambiguous': bool(runner_ups) and runner_ups[0]['distance'] - distance < margin,
+                    'candidates': runner_ups
+                })
 
             # Tìm các khuôn mặt không match
+            matched_detected_indices = set(face_indices.tolist())
             unmatched_indices = [
                 i for i in range(len(detected_vectors))
                 if i not in matched_detected_indices
@@ -376,20 +512,105 @@ class FaceEmbeddingService:
 
             return {
                 'matches': matches,
-                'unmatched_indices': unmatched_indices
+                'unmatched_indices': unmatched_indices,
+                # Khuôn mặt có ứng viên dưới threshold nhưng sinh viên đã được
+                # ghép với khuôn mặt khác gần hơn
+                'unmatched_candidates': {
+                    i: candidates[i] for i in unmatched_indices if candidates[i]
+                }
             }
 
         except Exception as e:
             return {
                 'matches': [],
                 'unmatched_indices': list(range(len(detected_vectors))),
+                'unmatched_candidates': {},
                 'error': str(e)
             }
 
+    @classmethod
+    def search(cls, vector, k=5):
+        """
+        Tìm k tài khoản có khuôn mặt gần nhất trên toàn trường (index ANN,
+        build bằng python manage.py build_face_index), không giới hạn trong
+        danh sách một lớp.
+
+        Args:
+            vector: Embedding (list, numpy array, bytes hoặc JSON string)
+            k (int): Số kết quả
+
+        Returns:
+            list: [{'user_id': int, 'distance': float}] gần nhất trước,
+                [] nếu chưa build index
+        """
+        from apps.admins.services.face_index import CampusFaceIndex
+
+        if isinstance(vector, (str, bytes, bytearray, memoryview)):
+            vector = cls.string_to_vector(vector)
+        if vector is None:
+            return []
+
+        return [
+            {'user_id': user_id, 'distance': distance}
+            for user_id, distance in CampusFaceIndex.get().search(vector, k)
+        ]
+
+    @staticmethod
+    def get_embedding_dtype():
+        """dtype lưu embedding nhị phân (settings.FACE_EMBEDDING_DTYPE)"""
+        dtype = getattr(settings, 'FACE_EMBEDDING_DTYPE', 'float32')
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"FACE_EMBEDDING_DTYPE '{dtype}' is not supported, expected one of {EMBEDDING_DTYPES}")
+        return dtype
+
+    @classmethod
+    def vector_to_bytes(cls, vector, dtype=None):
+        """
+        Encode vector (list/numpy array/tensor) thành bytes để lưu DB.
+
+        Args:
+            vector: list, numpy array hoặc torch.Tensor 512 chiều
+            dtype (str): 'float32' (2 KB) hoặc 'float16' (1 KB),
+                mặc định settings.FACE_EMBEDDING_DTYPE
+
+        Returns:
+            bytes: Vector dạng little-endian
+        """
+        if isinstance(vector, torch.Tensor):
+            vector = vector.detach().cpu().numpy()
+        dtype = np.dtype(dtype or cls.get_embedding_dtype()).newbyteorder('<')
+        return np.asarray(vector, dtype=dtype).tobytes()
+
+    @staticmethod
+    def bytes_to_vector(data):
+        """
+        Decode bytes từ DB thành vector (numpy array, không copy).
+
+        dtype suy ra từ độ dài: 2048 bytes là float32, 1024 bytes là float16
+        (float16 được chuyển sang float32 nên có copy).
+
+        Args:
+            data (bytes | memoryview): Giá trị cột vector_embedding_bin
+
+        Returns:
+            np.ndarray: Vector float32 chỉ đọc, None nếu dữ liệu không hợp lệ
+        """
+        if not data:
+            return None
+        size = memoryview(data).nbytes
+        if size == EMBEDDING_DIM * 4:
+            return np.frombuffer(data, dtype='<f4')
+        if size == EMBEDDING_DIM * 2:
+            return np.frombuffer(data, dtype='<f2').astype(np.float32)
+        print(f"Error decoding vector bytes: unexpected size {size}")
+        return None
+
     @staticmethod
     def vector_to_string(vector):
         """
-        Convert vector (list/numpy array) thành string để lưu DB.
+        Convert vector (list/numpy array) thành JSON string.
+
+        Chỉ dùng cho response API, DB lưu dạng nhị phân (vector_to_bytes).
 
         Args:
             vector: list hoặc numpy array
@@ -401,19 +622,21 @@ class FaceEmbeddingService:
             vector = vector.tolist()
         return json.dumps(vector)
 
-    @staticmethod
-    def string_to_vector(vector_str):
+    @classmethod
+    def string_to_vector(cls, vector_str):
         """
-        Convert string từ DB thành vector (list).
+        Convert giá trị embedding từ DB thành vector.
 
         Args:
-            vector_str (str): JSON string
+            vector_str (bytes | memoryview | str): Cột nhị phân hoặc JSON string cũ
 
         Returns:
-            list: Vector dạng list
+            np.ndarray (bytes) hoặc list (JSON): Vector, None nếu không hợp lệ
         """
         if not vector_str:
             return None
+        if isinstance(vector_str, (bytes, bytearray, memoryview)):
+            return cls.bytes_to_vector(vector_str)
         try:
             return json.loads(vector_str)
         except (json.JSONDecodeError, TypeError) as e:
@@ -426,8 +649,8 @@ class FaceEmbeddingService:
         So sánh 2 vector khuôn mặt.
 
         Args:
-            vector1_str (str): Vector 1 (JSON string)
-            vector2_str (str): Vector 2 (JSON string)
+            vector1_str (bytes | str): Vector 1 (nhị phân hoặc JSON string)
+            vector2_str (bytes | str): Vector 2 (nhị phân hoặc JSON string)
             threshold (float): Ngưỡng khoảng cách
 
         Returns:
@@ -448,20 +671,18 @@ class FaceEmbeddingService:
                     'similarity': 0.0
                 }
 
-            # Convert to tensors
-            v1 = torch.tensor(vector1, dtype=torch.float32).unsqueeze(0)
-            v2 = torch.tensor(vector2, dtype=torch.float32).unsqueeze(0)
-
-            # Tính khoảng cách Euclidean
-            distance = torch.cdist(v1, v2, p=2).item()
+            # Tính khoảng cách Euclidean (cùng kernel với match_faces_batch)
+            distance = similarity.distances(
+                np.asarray(vector1, dtype=np.float32), similarity.as_gallery(vector2)
+            ).item()
 
             # Tính similarity (1 - normalized_distance)
-            similarity = max(0.0, 1.0 - distance)
+            similarity_score = max(0.0, 1.0 - distance)
 
             return {
                 'is_match': distance < threshold,
                 'distance': distance,
-                'similarity': similarity
+                'similarity': similarity_score
             }
 
         except Exception as e:
@@ -501,13 +722,18 @@ class FaceEmbeddingService:
         }
 
     @classmethod
-    def extract_face_boxes_with_details(cls, image_file=None, image_path=None):
+    def extract_face_boxes_with_details(cls, image_file=None, image_path=None, img=None,
+                                        cancel_event=None):
         """
         Trích xuất tất cả khuôn mặt với thông tin chi tiết (box, alignment, etc).
 
         Args:
             image_file: Django UploadedFile
             image_path (str): Đường dẫn file ảnh
+            img (np.ndarray): Ảnh đã decode sẵn (BGR), dùng chung với các
+                service khác để không phải decode lại file upload
+            cancel_event (threading.Event): Nếu được set thì dừng trước bước
+                detect/recognize tiếp theo (VD OCR báo sai phòng)
 
         Returns:
             dict: {
@@ -528,7 +754,9 @@ class FaceEmbeddingService:
         """
         try:
             # Đọc ảnh
-            if image_file:
+            if img is not None:
+                pass
+            elif image_file:
                 img = cls.read_image_file(image_file)
             elif image_path:
                 img = cls.read_image_from_path(image_path)
@@ -545,10 +773,14 @@ class FaceEmbeddingService:
             detector = cls.get_detector()
             recognizer = cls.get_recognizer()
 
-            # Cập nhật kích thước ảnh cho detector
-            detector.im_height = img.shape[0]
-            detector.im_width = img.shape[1]
-            detector.prior_data = detector._create_prior_box()
+            if cancel_event is not None and cancel_event.is_set():
+                return {
+                    'success': False,
+                    'faces': [],
+                    'face_count': 0,
+                    'message': 'Face extraction cancelled',
+                    'image': img
+                }
 
             # Detect faces
             faces, boxes, scores, landmarks = detector.detect_single(
@@ -566,6 +798,16 @@ class FaceEmbeddingService:
                     'image': img
                 }
 
+            # Bỏ bước recognize nếu đã bị huỷ trong lúc detect
+            if cancel_event is not None and cancel_event.is_set():
+                return {
+                    'success': False,
+                    'faces': [],
+                    'face_count': 0,
+                    'message': 'Face extraction cancelled',
+                    'image': img
+                }
+
             # Trích xuất features từ tất cả khuôn mặt
             features = recognizer.extract_features(faces)
 
@@ -598,4 +840,101 @@ class FaceEmbeddingService:
                 'face_count': 0,
                 'message': f'Error extracting face boxes: {str(e)}',
                 'image': None
-            }
\ No newline at end of file
+            }
+
+    @classmethod
+    def extract_faces_batch(cls, images):
+        """
+        Trích xuất khuôn mặt từ nhiều ảnh trong một lần chạy model.
+
+        Các ảnh có thể khác kích thước: detector pad chúng về cùng một canvas
+        và chạy một forward pass, sau đó recognizer trích xuất feature cho
+        toàn bộ khuôn mặt của tất cả ảnh trong một batch.
+
+        Args:
+            images (list): List ảnh, mỗi phần tử là np.ndarray (BGR),
+                Django UploadedFile hoặc đường dẫn file ảnh
+
+        Returns:
+            list of dict: Mỗi ảnh một dict, cùng định dạng với
+                extract_face_boxes_with_details
+        """
+        results = [None] * len(images)
+        imgs = []
+        img_indices = []
+
+        # Đọc ảnh
+        for i, image in enumerate(images):
+            try:
+                if isinstance(image, np.ndarray):
+                    img = image
+                elif isinstance(image, str):
+                    img = cls.read_image_from_path(image)
+                else:
+                    img = cls.read_image_file(image)
+                imgs.append(img)
+                img_indices.append(i)
+            except Exception as e:
+                results[i] = {
+                    'success': False,
+                    'faces': [],
+                    'face_count': 0,
+                    'message': f'Error extracting face boxes: {str(e)}',
+                    'image': None
+                }
+
+        if not imgs:
+            return results
+
+        try:
+            detector = cls.get_detector()
+            recognizer = cls.get_recognizer()
+
+            # Detect faces cho cả batch
+            detections = detector.detect_batch(imgs)
+
+            # Trích xuất features từ tất cả khuôn mặt của mọi ảnh
+            features = recognizer.extract_features([det['img'] for det in detections])
+
+            per_image_faces = [[] for _ in imgs]
+            for det, feature in zip(detections, features):
+                vector = feature.cpu().numpy().tolist()
+                per_image_faces[det['image_idx']].append({
+                    'vector': vector,
+                    'vector_str': json.dumps(vector),
+                    'box': det['box'].tolist(),
+                    'score': float(det['score']),
+                    'aligned_face': det['img']
+                })
+
+            for batch_idx, (i, img) in enumerate(zip(img_indices, imgs)):
+                face_results = per_image_faces[batch_idx]
+                if not face_results:
+                    results[i] = {
+                        'success': False,
+                        'faces': [],
+                        'face_count': 0,
+                        'message': 'No face detected in image',
+                        'image': img
+                    }
+                    continue
+
+                results[i] = {
+                    'success': True,
+                    'faces': face_results,
+                    'face_count': len(face_results),
+                    'message': f'Successfully extracted {len(face_results)} faces',
+                    'image': img
+                }
+
+        except Exception as e:
+            for i in img_indices:
+                results[i] = {
+                    'success': False,
+                    'faces': [],
+                    'face_count': 0,
+                    'message': f'Error extracting face boxes: {str(e)}',
+                    'image': None
+                }
+
+        return results
@@ -0,0 +1,280 @@
+import contextlib
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+
+from apps.admins.services.core import ann_index, similarity
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+# Một bản ghi cập nhật: user_id (âm = xoá) + vector float32
+DELTA_RECORD = np.dtype([('id', '<i8'), ('vector', '<f4', (EMBEDDING_DIM,))])
+
+
+def get_index_dir():
+    return getattr(settings, 'FACE_INDEX_DIR', os.path.join(settings.BASE_DIR, 'face_index'))
+
+
+class CampusFaceIndex:
+    """
+    Index ANN (IVF, core/ann_index.py) trên embedding của toàn bộ tài khoản,
+    dùng để tìm khuôn mặt lạ ngoài danh sách một lớp (phòng thi, thư viện...).
+
+    Thư mục FACE_INDEX_DIR:
+        build-<timestamp>-<id>/  index đã build (memory-map khi mở) + delta.log
+        current                  symlink tới build đang dùng
+        .lock                    flock giữa các process khi ghi delta.log / đổi build
+
+    Cập nhật tăng dần (tạo sinh viên, đổi ảnh đại diện) được ghi nối vào
+    delta.log (bản ghi kích thước cố định). Mọi process đọc tiếp phần mới
+    của delta.log trước mỗi lần search, nên worker khác cũng thấy cập nhật.
+    Vector trong delta được so khớp chính xác và thay thế bản cũ trong index.
+    Build lại định kỳ (python manage.py build_face_index) để gộp delta;
+    build trước đó được giữ lại tới lần build sau cho process còn đang mở nó.
+
+    Args:
+        directory (str): Thư mục index (mặc định settings.FACE_INDEX_DIR)
+        nprobe (int): Số list IVF quét mỗi lần search
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, directory=None, nprobe=None):
+        self.directory = directory or get_index_dir()
+        self.nprobe = nprobe or getattr(settings, 'FACE_INDEX_NPROBE', 32)
+        self._lock = threading.Lock()
+        self._build_dir = None
+        self._index = None
+        self._delta = {}  # user_id -> vector, None nếu đã xoá
+        self._delta_offset = 0
+        self._delta_gallery = None
+        self._delta_ids = None
+
+    @classmethod
+    def get(cls):
+        """Singleton CampusFaceIndex trong process"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @property
+    def current_link(self):
+        return os.path.join(self.directory, 'current')
+
+    def _current_build_dir(self):
+        try:
+            return os.path.join(self.directory, os.readlink(self.current_link))
+        except OSError:
+            return None
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """flock độc quyền trên FACE_INDEX_DIR/.lock (giữa các process)"""
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _delta_path(build_dir):
+        return os.path.join(build_dir, 'delta.log')
+
+    def _refresh(self):
+        """Mở build mới (nếu vừa build lại) và đọc phần delta.log mới ghi. Gọi khi giữ _lock."""
+        build_dir = self._current_build_dir()
+        if build_dir != self._build_dir:
+            self._build_dir = build_dir
+            self._index = ann_index.IVFIndex.load(build_dir) if build_dir else None
+            self._delta = {}
+            self._delta_offset = 0
+            self._delta_gallery = None
+            if self._index is not None:
+                logger.info(f"Face index opened: {len(self._index)} vectors, {self._index.nlist} lists")
+
+        if build_dir is None:
+            return
+
+        path = self._delta_path(build_dir)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        # Chỉ đọc bản ghi đầy đủ (process khác có thể đang ghi dở)
+        end = size - (size - self._delta_offset) % DELTA_RECORD.itemsize
+        if end <= self._delta_offset:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(self._delta_offset)
+            records = np.frombuffer(f.read(end - self._delta_offset), dtype=DELTA_RECORD)
+        self._delta_offset = end
+
+        for record_id, vector in zip(records['id'].tolist(), records['vector']):
+            if record_id < 0:
+                self._delta[-record_id] = None
+            else:
+                self._delta[record_id] = vector
+        self._delta_gallery = None
+
+    def _delta_matrix(self):
+        if self._delta_gallery is None:
+            live = [(user_id, vector) for user_id, vector in self._delta.items() if vector is not None]
+            self._delta_ids = np.asarray([user_id for user_id, _ in live], dtype=np.int64)
+            self._delta_gallery = similarity.as_gallery(
+                np.stack([vector for _, vector in live]) if live
+                else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            )
+        return self._delta_gallery, self._delta_ids
+
+    def is_built(self):
+        with self._lock:
+            self._refresh()
+            return self._index is not None
+
+    def search(self, vector, k=5):
+        """
+        k tài khoản có embedding gần vector nhất.
+
+        Args:
+            vector: Embedding 512 chiều đã L2-normalize
+            k (int): Số kết quả
+
+        Returns:
+            list: [(user_id, distance)] gần nhất trước, [] nếu chưa build index
+        """
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+
+        with self._lock:
+            self._refresh()
+            if self._index is None:
+                return []
+            index, delta = self._index, self._delta
+            delta_gallery, delta_ids = self._delta_matrix()
+
+        # Lấy dư để bù các kết quả đã bị delta thay thế
+        distances, ids = index.search(query, k + len(delta), self.nprobe)
+        results = [
+            (user_id, distance)
+            for user_id, distance in zip(ids.tolist(), distances.tolist())
+            if user_id not in delta
+        ]
+
+        if len(delta_ids):
+            delta_distances, delta_indices = similarity.topk(query, delta_gallery, k)
+            results.extend(zip(
+                delta_ids[delta_indices[0].numpy()].tolist(), delta_distances[0].tolist()
+            ))
+
+        results.sort(key=lambda item: item[1])
+        return results[:k]
+
+    def _append(self, records):
+        if not os.path.isdir(self.directory):
+            # Chưa build index: build lần đầu sẽ đọc thẳng từ DB
+            return
+
+        # Giữ flock để build không đổi current giữa lúc chọn delta.log và ghi
+        # (bản ghi sẽ nằm trong delta.log của build cũ và bị mất)
+        with self._lock:
+            try:
+                with self._file_lock():
+                    self._refresh()
+                    if self._build_dir is None:
+                        return
+                    with open(self._delta_path(self._build_dir), 'ab') as f:
+                        f.write(records.tobytes())
+            except OSError as e:
+                # Không làm hỏng thao tác lưu tài khoản, build sau sẽ đọc lại DB
+                logger.warning(f"Face index update failed: {e}")
+
+    def update(self, user_id, vector):
+        """Thêm/thay embedding của một tài khoản (vector None = xoá)"""
+        records = np.zeros(1, dtype=DELTA_RECORD)
+        if vector is None:
+            records['id'] = -user_id
+        else:
+            records['id'] = user_id
+            records['vector'] = np.asarray(vector, dtype=np.float32).reshape(-1)
+        self._append(records)
+
+    def remove(self, user_id):
+        self.update(user_id, None)
+
+    @staticmethod
+    def load_embeddings():
+        """(user_ids, vectors) của mọi TaiKhoan có embedding"""
+        from apps.admins.services.face_embedding_service import FaceEmbeddingService
+        from apps.my_built_in.models.tai_khoan import TaiKhoan
+
+        users = TaiKhoan.objects.filter(
+            is_active=True
+        ).only('id', 'vector_embedding', 'vector_embedding_bin')
+
+        user_ids, vectors = [], []
+        for user in users.iterator(chunk_size=2000):
+            vector = FaceEmbeddingService.string_to_vector(user.face_embedding)
+            if vector is not None and len(vector) == EMBEDDING_DIM:
+                user_ids.append(user.id)
+                vectors.append(vector)
+
+        matrix = np.stack(vectors).astype(np.float32) if vectors else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.asarray(user_ids, dtype=np.int64), matrix
+
+    def build(self, nlist=None, dtype=None):
+        """
+        Build lại index từ DB và chuyển symlink current sang bản mới.
+
+        Cập nhật ghi vào delta.log của bản cũ trong lúc build được chép
+        sang delta.log của bản mới, dưới cùng flock với _append nên không
+        bản ghi nào bị mất. Giữ lại build cũ, xoá các build trước đó.
+
+        Returns:
+            IVFIndex: Index vừa build
+        """
+        dtype = dtype or getattr(settings, 'FACE_INDEX_DTYPE', 'float32')
+        os.makedirs(self.directory, exist_ok=True)
+
+        old_build_dir = self._current_build_dir()
+        old_delta = self._delta_path(old_build_dir) if old_build_dir else None
+        old_delta_size = os.path.getsize(old_delta) if old_delta and os.path.exists(old_delta) else 0
+
+        user_ids, vectors = self.load_embeddings()
+        index = ann_index.IVFIndex.build(user_ids, vectors, nlist=nlist, dtype=np.dtype(dtype))
+
+        build_name = f"build-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        build_dir = os.path.join(self.directory, build_name)
+        index.save(build_dir)
+
+        with self._file_lock():
+            with open(self._delta_path(build_dir), 'wb') as f:
+                if old_delta and os.path.exists(old_delta):
+                    with open(old_delta, 'rb') as old:
+                        old.seek(old_delta_size)
+                        f.write(old.read())
+
+            tmp_link = f"{self.current_link}.{os.getpid()}"
+            os.symlink(build_name, tmp_link)
+            os.replace(tmp_link, self.current_link)
+
+        # Giữ build cũ cho process đang mở nó, xoá các build trước đó
+        # (process khác vẫn đọc được file đã mmap sau khi xoá trên Linux)
+        keep = {build_name, os.path.basename(old_build_dir) if old_build_dir else None}
+        for name in os.listdir(self.directory):
+            if name.startswith('build-') and name not in keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+        logger.info(f"Face index built: {len(index)} vectors, {index.nlist} lists in {build_dir}")
+        return index
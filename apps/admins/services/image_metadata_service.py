@@ -3,6 +3,8 @@ from PIL.ExifTags import TAGS
 from datetime import datetime, time, timedelta
 import io
 
+from apps.admins.services.attendance_frame import AttendanceFrame
+
 
 class ImageMetadataService:
     """
@@ -16,11 +18,15 @@ class ImageMetadataService:
         Lấy thời gian chụp ảnh từ EXIF metadata
         
         Args:
-            image_file: Django UploadedFile
+            image_file: Django UploadedFile hoặc AttendanceFrame
+                (dùng EXIF đã đọc sẵn, không mở lại file)
             
         Returns:
             datetime hoặc None nếu không có metadata
         """
+        if isinstance(image_file, AttendanceFrame):
+            return ImageMetadataService._parse_exif_datetime(image_file.exif)
+
         try:
             # Reset file pointer
             image_file.seek(0)
@@ -53,6 +59,25 @@ class ImageMetadataService:
             # Reset file pointer
             image_file.seek(0)
 
+    @staticmethod
+    def _parse_exif_datetime(exif):
+        """
+        Lấy thời gian chụp từ EXIF dạng {tên tag: giá trị}.
+
+        Returns:
+            datetime hoặc None
+        """
+        for tag in ['DateTimeOriginal', 'DateTime']:
+            value = exif.get(tag)
+            if not value:
+                continue
+            try:
+                # Format: "2024:12:07 14:30:45"
+                return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+            except (TypeError, ValueError):
+                continue
+        return None
+
     @staticmethod
     def get_period_time_range(start_period):
         """
@@ -87,7 +112,7 @@ class ImageMetadataService:
         Kiểm tra thời gian chụp ảnh có hợp lệ với buổi học không
         
         Args:
-            image_file: Django UploadedFile
+            image_file: Django UploadedFile hoặc AttendanceFrame
             lesson_date: Ngày của buổi học (date object)
             start_period: Tiết bắt đầu (1-10)
             tolerance_minutes: Dung sai (phút) - cho phép chụp trước/sau
@@ -0,0 +1,131 @@
+import threading
+from multiprocessing.connection import Client
+
+import torch
+from django.conf import settings
+
+
+def get_server_address():
+    return getattr(settings, 'INFERENCE_SERVER_ADDRESS', '/tmp/attendance-inference.sock')
+
+
+def get_server_authkey():
+    authkey = getattr(settings, 'INFERENCE_SERVER_AUTHKEY', None) or settings.SECRET_KEY
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class InferenceClient:
+    """
+    Kết nối tới InferenceServer qua Unix socket.
+
+    Mỗi thread của worker dùng một kết nối riêng (threading.local), nên
+    các request song song trong một worker không phải chờ nhau ở phía client.
+    Kết nối bị đứt (server restart) được mở lại và gửi lại request một lần.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or get_server_address()
+        self.authkey = authkey or get_server_authkey()
+        self._local = threading.local()
+
+    @classmethod
+    def get(cls):
+        """Singleton InferenceClient trong process"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, op, *args):
+        """
+        Gọi một op trên server.
+
+        Raises:
+            RuntimeError: Server trả lỗi
+            ConnectionError/OSError: Không kết nối được tới server
+        """
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, args))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._reset()
+                if attempt:
+                    raise
+
+        if status != 'ok':
+            raise RuntimeError(f"Inference server error: {result}")
+        return result
+
+
+class RemoteFaceDetector:
+    """Thay thế FaceDetector, detect trên inference server"""
+
+    def __init__(self, client=None):
+        self.client = client or InferenceClient.get()
+
+    def detect_single(self, img, return_aligned=True, **kwargs):
+        faces, boxes, scores, landmarks = self.client.call('detect', [img])[0]
+        return (faces if return_aligned else []), boxes, scores, landmarks
+
+    def detect_batch(self, batch_imgs):
+        batch_results = []
+        per_image = self.client.call('detect', list(batch_imgs))
+        for img_idx, (faces, boxes, scores, landmarks) in enumerate(per_image):
+            for face, box, score, landm in zip(faces, boxes, scores, landmarks):
+                batch_results.append({
+                    'box': box,
+                    'score': score,
+                    'landmarks': landm,
+                    'img': face,
+                    'image_idx': img_idx
+                })
+        return batch_results
+
+
+class RemoteFaceRecognition:
+    """Thay thế FaceRecognition cho extract_features, chạy trên inference server"""
+
+    def __init__(self, client=None):
+        self.client = client or InferenceClient.get()
+        info = self.client.call('info')
+        self.image_size = info['image_size']
+        self.batch_size = info['batch_size']
+        self.use_flip = info['use_flip']
+
+    def extract_features(self, faces, use_flip=None):
+        features = self.client.call('extract_features', list(faces), use_flip)
+        return torch.from_numpy(features)
+
+
+class RemoteOCR:
+    """Thay thế PaddleOCR.ocr, chạy trên inference server"""
+
+    def __init__(self, client=None):
+        self.client = client or InferenceClient.get()
+
+    def ocr(self, img):
+        result = self.client.call('ocr', img)
+        return result or [None]
@@ -0,0 +1,173 @@
+import logging
+import os
+import socket
+import stat
+import threading
+from multiprocessing.connection import Listener
+
+import numpy as np
+from django.conf import settings
+
+from apps.admins.services.core.micro_batch import MicroBatcher
+from apps.admins.services.face_embedding_service import FaceEmbeddingService
+from apps.admins.services.inference_client import get_server_address, get_server_authkey
+from apps.admins.services.ocr_service import OCRService
+
+logger = logging.getLogger(__name__)
+
+
+def remove_stale_socket(address):
+    """
+    Xoá Unix socket còn lại từ server đã dừng.
+
+    Raises:
+        RuntimeError: address là file thường/thư mục, hoặc đang có server
+            khác listen trên socket
+    """
+    try:
+        mode = os.lstat(address).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"Inference server address {address} exists and is not a socket")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise RuntimeError(f"An inference server is already listening on {address}")
+
+    os.unlink(address)
+
+
+class InferenceServer:
+    """
+    Process riêng giữ FaceDetector, FaceRecognition và PaddleOCR, phục vụ
+    các Django worker qua Unix socket (multiprocessing.connection).
+
+    Mỗi worker chỉ giữ client nhẹ (inference_client.py), model và CUDA
+    context chỉ có một bản trong server. Request đồng thời từ nhiều worker
+    được gom lại (MicroBatcher):
+        - detect: gom ảnh, một forward pass RetinaFace (detect_batch)
+        - extract_features: gom khuôn mặt, một forward pass GhostFaceNet
+        - ocr: PaddleOCR không thread-safe nên chạy lần lượt từng ảnh
+
+    Giao thức: client gửi (op, args), server trả ('ok', result) hoặc
+    ('error', message).
+
+    Args:
+        address (str): Đường dẫn Unix socket
+        authkey (bytes): Khoá xác thực kết nối
+    """
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or get_server_address()
+        self.authkey = authkey or get_server_authkey()
+
+        max_wait_ms = getattr(settings, 'INFERENCE_SERVER_MAX_WAIT_MS', 5)
+
+        self.detector, self.recognizer = FaceEmbeddingService.use_local_models()
+        self.ocr = OCRService.use_local_ocr()
+
+        self._detect_batcher = MicroBatcher(
+            self._detect, getattr(settings, 'INFERENCE_SERVER_MAX_BATCH_IMAGES', 8),
+            max_wait_ms, name='inference-detect'
+        )
+        self._feature_batchers = {
+            use_flip: MicroBatcher(
+                lambda faces, use_flip=use_flip: self._extract_features(faces, use_flip),
+                getattr(settings, 'INFERENCE_SERVER_MAX_BATCH_FACES', 64),
+                max_wait_ms, name=f'inference-features-flip{int(use_flip)}'
+            )
+            for use_flip in (True, False)
+        }
+        self._ocr_batcher = MicroBatcher(self._ocr, 1, 0, name='inference-ocr')
+
+        self._handlers = {
+            'ping': lambda: 'pong',
+            'info': self._info,
+            'detect': lambda imgs: self._detect_batcher(imgs),
+            'extract_features': self._handle_extract_features,
+            'ocr': lambda img: self._ocr_batcher([img])[0],
+        }
+
+    def _info(self):
+        return {
+            'image_size': self.recognizer.image_size,
+            'batch_size': self.recognizer.batch_size,
+            'use_flip': self.recognizer.use_flip,
+        }
+
+    def _detect(self, imgs):
+        """Một forward pass cho tất cả ảnh, trả (faces, boxes, scores, landmarks) theo ảnh"""
+        per_image = [([], [], [], []) for _ in imgs]
+        for det in self.detector.detect_batch(imgs):
+            faces, boxes, scores, landmarks = per_image[det['image_idx']]
+            faces.append(det['img'])
+            boxes.append(det['box'])
+            scores.append(det['score'])
+            landmarks.append(det['landmarks'])
+        return per_image
+
+    def _extract_features(self, faces, use_flip):
+        return self.recognizer.extract_features(faces, use_flip=use_flip).cpu().numpy()
+
+    def _handle_extract_features(self, faces, use_flip=None):
+        if use_flip is None:
+            use_flip = self.recognizer.use_flip
+        if not faces:
+            return np.empty((0, 512), dtype=np.float32)
+        return self._feature_batchers[bool(use_flip)](faces)
+
+    def _ocr(self, imgs):
+        """Kết quả PaddleOCR dạng dict thuần để gửi qua socket"""
+        results = []
+        for img in imgs:
+            result = self.ocr.ocr(img)
+            if not result or not result[0]:
+                results.append(None)
+                continue
+            res = result[0]
+            results.append([{
+                'rec_texts': list(res.get('rec_texts', [])),
+                'rec_scores': [float(score) for score in res.get('rec_scores', [])],
+                'rec_boxes': [np.asarray(box) for box in res.get('rec_boxes', [])],
+            }])
+        return results
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    reply = ('ok', self._handlers[op](*args))
+                except Exception as e:
+                    logger.exception(f"Inference op '{op}' failed")
+                    reply = ('error', f"{type(e).__name__}: {e}")
+
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self):
+        """Nhận kết nối từ các worker, mỗi kết nối một thread"""
+        remove_stale_socket(self.address)
+
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            logger.info(f"Inference server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    logger.exception("Rejected inference connection")
+                    continue
+                threading.Thread(
+                    target=self._serve_connection, args=(conn,), daemon=True
+                ).start()
@@ -0,0 +1,163 @@
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Kích thước ảnh (height, width) hay gặp khi chụp điểm danh bằng điện thoại
+DEFAULT_WARMUP_RESOLUTIONS = [
+    (720, 1280),
+    (1280, 720),
+    (3000, 4000),
+    (4000, 3000),
+]
+
+
+# Tên lệnh (argv[0] hoặc package chạy bằng python -m) của WSGI/ASGI server
+DEFAULT_SERVER_ENTRYPOINTS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi')
+
+
+def _entrypoint_name(argv0):
+    """gunicorn cho '/venv/bin/gunicorn' và '.../gunicorn/__main__.py' (python -m gunicorn)"""
+    name = os.path.basename(argv0)
+    if name == '__main__.py':
+        name = os.path.basename(os.path.dirname(argv0))
+    return os.path.splitext(name)[0]
+
+
+def should_warm_up_on_startup():
+    """
+    Có preload model khi process khởi động hay không.
+
+    Chỉ chạy khi bật MODEL_WARMUP_ON_STARTUP và process là web server:
+    `manage.py runserver` (process con của autoreloader hoặc --noreload),
+    một server trong MODEL_WARMUP_SERVER_ENTRYPOINTS, hoặc process có
+    MODEL_WARMUP_SERVER=true. Các process khác (management command, celery,
+    pytest, script...) không load model.
+    """
+    if not getattr(settings, 'MODEL_WARMUP_ON_STARTUP', False):
+        return False
+
+    if getattr(settings, 'MODEL_WARMUP_SERVER', False):
+        return True
+
+    entrypoints = getattr(settings, 'MODEL_WARMUP_SERVER_ENTRYPOINTS', DEFAULT_SERVER_ENTRYPOINTS)
+    if _entrypoint_name(sys.argv[0]) in entrypoints:
+        return True
+
+    if os.path.basename(sys.argv[0]) != 'manage.py':
+        return False
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False
+
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
+def _timed(label, func, timings):
+    start = time.perf_counter()
+    result = func()
+    timings[label] = time.perf_counter() - start
+    logger.info(f"[warmup] {label}: {timings[label] * 1000:.0f} ms")
+    return result
+
+
+def _open_face_index(timings):
+    """Index khuôn mặt toàn trường: memory-map file index, đọc delta.log"""
+    try:
+        from apps.admins.services.face_index import CampusFaceIndex
+
+        _timed('face_index.open', CampusFaceIndex.get().is_built, timings)
+    except Exception:
+        logger.exception("[warmup] Face index open failed")
+
+
+def warm_up_models(resolutions=None, remote=None):
+    """
+    Load PaddleOCR, RetinaFace và GhostFaceNet rồi chạy một lần inference
+    giả cho mỗi kích thước ảnh, để request đầu tiên sau khi deploy/restart
+    worker không phải chờ load weights, khởi tạo CUDA/cuDNN và PaddleOCR.
+
+    Với INFERENCE_BACKEND='server' model nằm ở inference server (đã tự
+    warm-up khi khởi động), worker chỉ ping một lần để mở kết nối thay vì
+    gửi ảnh giả qua socket.
+
+    Model nào lỗi thì ghi log và bỏ qua, các model còn lại vẫn được load.
+
+    Args:
+        resolutions (list): Danh sách (height, width)
+            (default: settings.MODEL_WARMUP_RESOLUTIONS)
+        remote (bool): Model ở inference server
+            (default: FaceEmbeddingService.use_inference_server())
+
+    Returns:
+        dict: {tên bước: thời gian (giây)}
+    """
+    from apps.admins.services.face_embedding_service import FaceEmbeddingService
+
+    if resolutions is None:
+        resolutions = getattr(settings, 'MODEL_WARMUP_RESOLUTIONS', DEFAULT_WARMUP_RESOLUTIONS)
+    if remote is None:
+        remote = FaceEmbeddingService.use_inference_server()
+
+    timings = {}
+    total_start = time.perf_counter()
+
+    if remote:
+        try:
+            from apps.admins.services.inference_client import InferenceClient
+
+            _timed('inference_server.ping', lambda: InferenceClient.get().call('ping'), timings)
+        except Exception:
+            logger.exception("[warmup] Inference server ping failed")
+        _open_face_index(timings)
+        timings['total'] = time.perf_counter() - total_start
+        logger.info(f"[warmup] Inference server ready in {timings['total']:.1f} s")
+        return timings
+
+    # RetinaFace: mỗi kích thước canvas cần prior box và thuật toán cuDNN riêng
+    try:
+        detector = _timed('detector.load', FaceEmbeddingService.get_detector, timings)
+        for height, width in resolutions:
+            img = np.zeros((height, width, 3), dtype=np.uint8)
+            _timed(f'detector.warmup.{height}x{width}',
+                   lambda: detector.detect_single(img), timings)
+    except Exception:
+        logger.exception("[warmup] RetinaFace warm-up failed")
+
+    # GhostFaceNet: batch 1 (ảnh đăng ký) và batch đầy (ảnh lớp học)
+    try:
+        recognizer = _timed('recognizer.load', FaceEmbeddingService.get_recognizer, timings)
+        size = recognizer.image_size
+        for batch_size in sorted({1, recognizer.batch_size}):
+            faces = [np.zeros((size, size, 3), dtype=np.uint8)] * batch_size
+            _timed(f'recognizer.warmup.batch{batch_size}',
+                   lambda: recognizer.extract_features(faces), timings)
+    except Exception:
+        logger.exception("[warmup] GhostFaceNet warm-up failed")
+
+    # PaddleOCR: kích thước ảnh thu nhỏ mà OCR hai bước đưa vào model
+    try:
+        from apps.admins.services.ocr_service import OCRService
+
+        ocr = _timed('ocr.load', OCRService.get_ocr, timings)
+        preview_size = getattr(settings, 'OCR_PREVIEW_MAX_SIZE', 1280)
+        ocr_shapes = set()
+        for height, width in resolutions:
+            scale = min(1.0, preview_size / max(height, width))
+            ocr_shapes.add((round(height * scale), round(width * scale)))
+        for height, width in sorted(ocr_shapes):
+            img = np.full((height, width, 3), 255, dtype=np.uint8)
+            _timed(f'ocr.warmup.{height}x{width}', lambda: ocr.ocr(img), timings)
+    except Exception:
+        logger.exception("[warmup] PaddleOCR warm-up failed")
+
+    _open_face_index(timings)
+
+    timings['total'] = time.perf_counter() - total_start
+    logger.info(f"[warmup] Models ready in {timings['total']:.1f} s")
+    return timings
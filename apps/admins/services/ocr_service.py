@@ -1,8 +1,12 @@
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
 import re
+import threading
+from django.conf import settings
+
+from apps.admins.services.attendance_frame import AttendanceFrame
+from apps.admins.services.room_code_matcher import RoomCodeMatcher
 
 
 class OCRService:
@@ -12,18 +16,38 @@ class OCRService:
     """
 
     _ocr_instance = None
+    _ocr_lock = threading.Lock()
 
     @classmethod
     def get_ocr(cls):
         print("call get ocr")
-        """Singleton pattern cho PaddleOCR"""
+        """Singleton pattern cho PaddleOCR (hoặc client tới inference server)"""
         if cls._ocr_instance is None:
-            cls._ocr_instance = PaddleOCR(
-                use_doc_orientation_classify=False,
-                use_doc_unwarping=False,
-                use_textline_orientation=False,
-                lang='vi'
-            )
+            with cls._ocr_lock:
+                if cls._ocr_instance is None:
+                    if getattr(settings, 'INFERENCE_BACKEND', 'local') == 'server':
+                        from apps.admins.services.inference_client import RemoteOCR
+                        cls._ocr_instance = RemoteOCR()
+                    else:
+                        cls._ocr_instance = cls.create_ocr()
+        return cls._ocr_instance
+
+    @staticmethod
+    def create_ocr():
+        """Load PaddleOCR trong process hiện tại"""
+        from paddleocr import PaddleOCR
+
+        return PaddleOCR(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_textline_orientation=False,
+            lang='vi'
+        )
+
+    @classmethod
+    def use_local_ocr(cls):
+        """Load PaddleOCR trong process hiện tại, bỏ qua INFERENCE_BACKEND"""
+        cls._ocr_instance = cls.create_ocr()
         return cls._ocr_instance
 
     @staticmethod
@@ -48,31 +72,36 @@ class OCRService:
         Đọc ảnh từ Django UploadedFile.
 
         Args:
-            image_file: Django UploadedFile object
+            image_file: Django UploadedFile object hoặc AttendanceFrame
+                (đã decode sẵn, trả về luôn ảnh của frame)
 
         Returns:
             np.ndarray: OpenCV image (BGR format)
         """
-        import io
-        from PIL import Image as PILImage
+        if isinstance(image_file, AttendanceFrame):
+            return image_file.image
 
         try:
             image_bytes = image_file.read()
-            pil_image = PILImage.open(io.BytesIO(image_bytes))
-            # Convert PIL image to OpenCV format (BGR)
-            cv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+            # Decode thẳng sang BGR giống FaceEmbeddingService.read_image_file
+            cv_image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if cv_image is None:
+                raise ValueError("Cannot decode image")
             return cv_image
         except Exception as e:
             raise ValueError(f"Error reading image file: {str(e)}")
 
     @classmethod
-    def extract_text_from_image(cls, image_path: str = None, image_file=None) -> Dict:
+    def extract_text_from_image(cls, image_path: str = None, image_file=None,
+                                img: np.ndarray = None) -> Dict:
         """
         Trích xuất tất cả text từ ảnh bằng OCR.
 
         Args:
             image_path (str): Đường dẫn file ảnh
             image_file: Django UploadedFile object
+            img (np.ndarray): Ảnh đã decode sẵn (BGR), dùng chung với
+                FaceEmbeddingService để không phải decode lại file upload
 
         Returns:
             dict: {
@@ -90,11 +119,8 @@ class OCRService:
         try:
             print(image_file)
             # Đọc ảnh
-            if image_file:
-                img = cls.read_image_from_file(image_file)
-            elif image_path:
-                img = cls.read_image_from_path(image_path)
-            else:
+            img = cls._read_image(image_path, image_file, img)
+            if img is None:
                 return {
                     'success': False,
                     'texts': [],
@@ -102,53 +128,14 @@ class OCRService:
                 }
 
             # Run OCR
-            ocr = cls.get_ocr()
-            result = ocr.ocr(img)
-            if not result or not result[0]:
+            extracted_texts = cls._run_ocr(img)
+            if extracted_texts is None:
                 return {
                     'success': False,
                     'texts': [],
                     'message': 'No text detected in image'
                 }
 
-            res = result[0]
-            texts = res.get("rec_texts", [])
-            scores = res.get("rec_scores", [])
-            boxes = res.get("rec_boxes", [])
-
-            extracted_texts = []
-
-            for text, score, box in zip(texts, scores, boxes):
-
-                b = np.array(box)
-
-                # Case 1: box = (4,) → (x1,y1,x2,y2)
-                if b.shape == (4,):
-                    x1, y1, x2, y2 = b
-                    b = np.array([
-                        [x1, y1],
-                        [x2, y1],
-                        [x2, y2],
-                        [x1, y2],
-                    ])
-
-                # Case 2: box = (8,) → reshape (4,2)
-                elif b.shape == (8,):
-                    b = b.reshape((4, 2))
-
-                # Case 3: box = (4,2) → ok
-                elif b.shape == (4, 2):
-                    pass
-
-                else:
-                    print("⚠ Box format lạ:", b.shape)
-                    continue
-
-                extracted_texts.append({
-                    "text": text,
-                    "confidence": float(score),
-                    "box": b.astype(int).tolist()
-                })
             print(extracted_texts)
             return {
                 'success': True,
@@ -163,18 +150,274 @@ class OCRService:
                 'message': f'Error extracting text: {str(e)}'
             }
 
+    @classmethod
+    def _read_image(cls, image_path=None, image_file=None, img=None):
+        """Lấy ảnh BGR từ img, image_file hoặc image_path (None nếu không có)."""
+        if img is not None:
+            return img
+        if image_file:
+            return cls.read_image_from_file(image_file)
+        if image_path:
+            return cls.read_image_from_path(image_path)
+        return None
+
+    @classmethod
+    def _run_ocr(cls, img: np.ndarray, scale: float = 1.0,
+                 offset: Tuple[int, int] = (0, 0)) -> Optional[List[Dict]]:
+        """
+        Chạy PaddleOCR trên một ảnh, trả box theo toạ độ ảnh gốc.
+
+        Args:
+            img (np.ndarray): Ảnh đưa vào OCR (ảnh gốc, ảnh thu nhỏ hoặc vùng crop)
+            scale (float): Tỉ lệ từ ảnh gốc sang img
+            offset (tuple): (x, y) góc trên trái của img trong ảnh gốc
+
+        Returns:
+            list of dict {'text', 'confidence', 'box'} theo thứ tự PaddleOCR
+            trả về, hoặc None nếu OCR không trả về kết quả
+        """
+        lines = cls._ocr_lines(img)
+        if lines is None:
+            return None
+
+        extracted_texts = []
+        for text, score, box in lines:
+            text_item = cls._to_text_item(text, score, box, scale, offset)
+            if text_item is not None:
+                extracted_texts.append(text_item)
+        return extracted_texts
+
+    @classmethod
+    def _ocr_lines(cls, img: np.ndarray) -> Optional[List[Tuple]]:
+        """Một lần PaddleOCR: list (text, score, box) hoặc None nếu không có kết quả"""
+        ocr = cls.get_ocr()
+        result = ocr.ocr(img)
+        if not result or not result[0]:
+            return None
+
+        res = result[0]
+        texts = res.get("rec_texts", [])
+        scores = res.get("rec_scores", [])
+        boxes = res.get("rec_boxes", [])
+        return list(zip(texts, scores, boxes))
+
+    @staticmethod
+    def _to_text_item(text, score, box, scale: float = 1.0,
+                      offset: Tuple[int, int] = (0, 0)) -> Optional[Dict]:
+        """Chuẩn hoá box về (4,2) theo toạ độ ảnh gốc, None nếu box lạ"""
+        b = np.array(box)
+
+        # Case 1: box = (4,) → (x1,y1,x2,y2)
+        if b.shape == (4,):
+            x1, y1, x2, y2 = b
+            b = np.array([
+                [x1, y1],
+                [x2, y1],
+                [x2, y2],
+                [x1, y2],
+            ])
+
+        # Case 2: box = (8,) → reshape (4,2)
+        elif b.shape == (8,):
+            b = b.reshape((4, 2))
+
+        # Case 3: box = (4,2) → ok
+        elif b.shape == (4, 2):
+            pass
+
+        else:
+            print("⚠ Box format lạ:", b.shape)
+            return None
+
+        # Đưa box về toạ độ ảnh gốc
+        b = b / scale + np.array(offset)
+
+        return {
+            "text": text,
+            "confidence": float(score),
+            "box": b.astype(int).tolist()
+        }
+
+    @staticmethod
+    def _box_area(box) -> float:
+        b = np.asarray(box).reshape(-1, 2)
+        return float(np.ptp(b[:, 0]) * np.ptp(b[:, 1]))
+
+    @classmethod
+    def iter_text_lines(cls, img: np.ndarray, scale: float = 1.0,
+                        offset: Tuple[int, int] = (0, 0)) -> Iterator[Dict]:
+        """
+        Generator các dòng text của một lần OCR, theo thứ tự confidence giảm
+        dần rồi diện tích box giảm dần.
+
+        Dòng nào chưa được lấy ra thì chưa được chuẩn hoá box, người gọi có
+        thể dừng ngay khi tìm thấy dòng cần.
+
+        Args:
+            img (np.ndarray): Ảnh đưa vào OCR
+            scale (float): Tỉ lệ từ ảnh gốc sang img
+            offset (tuple): (x, y) góc trên trái của img trong ảnh gốc
+
+        Yields:
+            dict: {'text', 'confidence', 'box'} (box theo toạ độ ảnh gốc)
+        """
+        lines = cls._ocr_lines(img)
+        if not lines:
+            return
+
+        lines.sort(key=lambda line: (-float(line[1]), -cls._box_area(line[2])))
+        for text, score, box in lines:
+            text_item = cls._to_text_item(text, score, box, scale, offset)
+            if text_item is not None:
+                yield text_item
+
+    @classmethod
+    def iter_room_code_stages(cls, img: np.ndarray,
+                              rank: Callable[[str], Optional[int]] = None
+                              ) -> Iterator[Tuple[bool, Iterator[Dict]]]:
+        """
+        Generator các bước OCR để tìm mã phòng, mỗi bước là
+        (full_resolution, iterator dòng text theo thứ tự của iter_text_lines).
+        Bước sau chỉ chạy OCR khi người gọi lấy tới nó:
+
+        1. OCR trên ảnh thu nhỏ (cạnh dài OCR_PREVIEW_MAX_SIZE) để tìm các vùng
+           text (full_resolution=False: text đọc sai được crop đọc lại)
+        2. OCR độ phân giải gốc trên tối đa OCR_CROP_CANDIDATES vùng có text
+           giống mã phòng nhất (theo rank, không theo diện tích: chữ to trong
+           ảnh lớp học thường là bảng/banner chứ không phải biển phòng)
+        3. OCR toàn ảnh gốc nếu ảnh thu nhỏ không có vùng nào giống mã phòng
+           để crop, hoặc (OCR_FULL_FRAME_FALLBACK) các crop không đọc được
+           text nào giống mã phòng
+
+        Args:
+            img (np.ndarray): Ảnh gốc (BGR)
+            rank (callable): text đã normalize -> mức giống mã phòng (nhỏ là
+                giống hơn) hoặc None nếu không giống (RoomCodeMatcher.likeness).
+                Mặc định mọi text đều được coi là giống
+
+        Yields:
+            tuple: (full_resolution, iterator dòng text {'text', 'confidence', 'box'}
+                với box theo toạ độ ảnh gốc)
+        """
+        if rank is None:
+            rank = lambda text: 0  # noqa: E731
+
+        height, width = img.shape[:2]
+        preview_size = getattr(settings, 'OCR_PREVIEW_MAX_SIZE', 1280)
+        scale = preview_size / max(height, width)
+
+        # Ảnh đã nhỏ: một lần OCR trên ảnh gốc là đủ
+        if scale >= 1:
+            yield True, cls.iter_text_lines(img)
+            return
+
+        # Bước 1: ảnh thu nhỏ (giữ lại toàn bộ để chọn vùng crop)
+        preview = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        preview_lines = list(cls.iter_text_lines(preview, scale=scale))
+        yield False, iter(preview_lines)
+
+        # Bước 2: crop độ phân giải gốc quanh các vùng text giống mã phòng nhất
+        ranked = []
+        for text_item in preview_lines:
+            text_rank = rank(cls._normalize_text(text_item['text']))
+            if text_rank is not None:
+                ranked.append((text_rank, -cls._box_area(text_item['box']), text_item))
+        ranked.sort(key=lambda entry: entry[:2])
+
+        crop_lines = []
+        for _, _, text_item in ranked[:getattr(settings, 'OCR_CROP_CANDIDATES', 3)]:
+            b = np.array(text_item['box'])
+            x1, y1 = b.min(axis=0)
+            x2, y2 = b.max(axis=0)
+            margin = max(8, int((y2 - y1) * 0.5))
+            x1, y1 = max(0, x1 - margin), max(0, y1 - margin)
+            x2, y2 = min(width, x2 + margin), min(height, y2 + margin)
+            if x2 <= x1 or y2 <= y1:
+                continue
+
+            lines = list(cls.iter_text_lines(img[y1:y2, x1:x2], offset=(x1, y1)))
+            crop_lines.extend(lines)
+            yield True, iter(lines)
+
+        # Bước 3: OCR toàn ảnh gốc khi chưa có lần đọc độ phân giải gốc nào
+        # thấy text giống mã phòng (biển phòng nhỏ, ảnh thu nhỏ không đọc được)
+        if not ranked or (getattr(settings, 'OCR_FULL_FRAME_FALLBACK', True) and not any(
+                rank(cls._normalize_text(text_item['text'])) is not None
+                for text_item in crop_lines
+        )):
+            yield True, cls.iter_text_lines(img)
+
+    @classmethod
+    def _match_room_code(cls, stages: Iterable[Tuple[bool, Iterable[Dict]]], normalized_expected: str,
+                         confidence_threshold: float, seen: List[Dict] = None,
+                         matcher: RoomCodeMatcher = None,
+                         fuzzy: bool = True) -> Tuple[Optional[Dict], Optional[int], Optional[Dict]]:
+        """
+        Lấy dòng text theo từng bước OCR cho tới dòng đầu tiên khớp mã phòng
+        (đã normalize).
+
+        Nếu hết một bước độ phân giải gốc mà không khớp nhưng đã đọc được mã
+        của một phòng khác trong PhongHoc thì dừng luôn (ảnh chụp sai phòng),
+        không chạy các bước OCR sau. Ảnh thu nhỏ có thể đọc sai biển phòng
+        nhỏ thành mã phòng bên cạnh nên không dừng ở bước đó.
+
+        Args:
+            stages (iterable): Các bước (full_resolution, iterable dòng text)
+                (có thể là generator, dừng sớm khi khớp)
+            normalized_expected (str): Mã phòng dự kiến đã normalize
+            confidence_threshold (float): Ngưỡng confidence
+            seen (list): Nếu có, mọi dòng đã lấy ra được thêm vào đây
+            matcher (RoomCodeMatcher): Danh sách mã phòng, dùng để nhận ra
+                phòng khác và (nếu fuzzy) chấp nhận text cách mã phòng một
+                phép sửa (không mơ hồ với phòng khác)
+            fuzzy (bool): Cho phép khớp gần đúng
+
+        Returns:
+            tuple: (text_item, distance, other_room_item) - distance 0 nếu
+                khớp chính xác, 1 nếu khớp gần đúng; khi không khớp
+                text_item/distance là None và other_room_item là dòng đọc
+                được mã phòng khác (hoặc None)
+        """
+        for full_resolution, lines in stages:
+            other_room_item = None
+            for text_item in lines:
+                if seen is not None:
+                    seen.append(text_item)
+                if text_item['confidence'] < confidence_threshold:
+                    continue
+
+                normalized_text = cls._normalize_text(text_item['text'])
+                if normalized_text == normalized_expected:
+                    return text_item, 0, None
+                if matcher is None:
+                    continue
+                if fuzzy and matcher.match(normalized_text, normalized_expected) == 1:
+                    return text_item, 1, None
+                if (full_resolution and other_room_item is None
+                        and matcher.is_other_room(normalized_text, normalized_expected)):
+                    other_room_item = text_item
+
+            if other_room_item is not None:
+                return None, None, other_room_item
+        return None, None, None
+
     @classmethod
     def validate_room_code_with_database(cls,
                                          expected_room_code: str,
                                          image_path: str = None,
                                          image_file=None,
-                                         confidence_threshold: float = 0.5) -> Dict:
+                                         confidence_threshold: float = 0.5,
+                                         img: np.ndarray = None) -> Dict:
         """
         Validate mã phòng từ ảnh so với mã phòng dự kiến.
 
         Flow:
-        1. Extract tất cả text từ ảnh
-        2. So sánh từng text với mã phòng dự kiến
+        1. Extract text từ ảnh (mặc định hai bước: ảnh thu nhỏ rồi crop
+           vùng text độ phân giải gốc, xem iter_room_code_stages)
+        2. So sánh từng text với mã phòng dự kiến (chính xác, hoặc cách một
+           phép sửa nếu bật OCR_FUZZY_ROOM_MATCH), dừng ở text khớp đầu tiên,
+           hoặc sau bước OCR đầu tiên đọc được mã của một phòng khác
         3. Trả về kết quả match + vị trí box trên ảnh
 
         Args:
@@ -182,6 +425,7 @@ class OCRService:
             image_path (str): Đường dẫn file ảnh
             image_file: Django UploadedFile object
             confidence_threshold (float): Ngưỡng confidence tối thiểu (0.0 - 1.0)
+            img (np.ndarray): Ảnh đã decode sẵn (BGR)
 
         Returns:
             dict: {
@@ -197,53 +441,66 @@ class OCRService:
         """
         try:
             print("call ocr")
-            # Extract text từ ảnh
-            extraction_result = cls.extract_text_from_image(image_path, image_file)
-            
-            if not extraction_result['success']:
-                return {
-                    'is_valid': False,
-                    'is_matched': False,
-                    'expected_room_code': expected_room_code,
-                    'detected_room_code': None,
-                    'detected_text_list': [],
-                    'matched_box': None,
-                    'matched_confidence': None,
-                    'message': extraction_result['message']
-                }
-
-            texts = extraction_result['texts']
-
             # Normalize expected room code
             normalized_expected = cls._normalize_text(expected_room_code)
 
-            # Tìm text match với room code
-            detected_room_code = None
-            matched_box = None
-            matched_confidence = None
-            detected_text_list = []
-
-            for text_item in texts:
-                text = text_item['text']
-                confidence = text_item['confidence']
-                box = text_item['box']
-
-                # Lưu tất cả text cho debugging
-                detected_text_list.append({
-                    'text': text,
-                    'confidence': confidence
-                })
-
-                # Normalize text từ OCR
-                normalized_text = cls._normalize_text(text)
-
-                # Check match
-                if (confidence >= confidence_threshold and
-                        normalized_text == normalized_expected):
-                    detected_room_code = text
-                    matched_box = box
-                    matched_confidence = confidence
-                    break  # Chỉ lấy match đầu tiên
+            if getattr(settings, 'OCR_TWO_STAGE', True):
+                # Ảnh thu nhỏ + crop vùng text, OCR bước sau chỉ chạy khi chưa khớp
+                img = cls._read_image(image_path, image_file, img)
+                if img is None:
+                    return {
+                        'is_valid': False,
+                        'is_matched': False,
+                        'expected_room_code': expected_room_code,
+                        'detected_room_code': None,
+                        'detected_text_list': [],
+                        'matched_box': None,
+                        'matched_confidence': None,
+                        'message': 'No image provided'
+                    }
+                stages = None  # tạo sau khi có matcher (rank vùng crop)
+            else:
+                # Extract text từ ảnh
+                extraction_result = cls.extract_text_from_image(image_path, image_file, img)
+
+                if not extraction_result['success']:
+                    return {
+                        'is_valid': False,
+                        'is_matched': False,
+                        'expected_room_code': expected_room_code,
+                        'detected_room_code': None,
+                        'detected_text_list': [],
+                        'matched_box': None,
+                        'matched_confidence': None,
+                        'message': extraction_result['message']
+                    }
+
+                stages = [(True, extraction_result['texts'])]
+
+            # Danh sách PhongHoc.room_code: nhận ra ảnh chụp phòng khác,
+            # chọn vùng crop và so khớp gần đúng (OCR_FUZZY_ROOM_MATCH)
+            matcher = RoomCodeMatcher.get(cls._normalize_text)
+            if stages is None:
+                stages = cls.iter_room_code_stages(
+                    img, rank=lambda text: matcher.likeness(text, normalized_expected)
+                )
+
+            texts = []
+            matched_item, match_distance, other_room_item = cls._match_room_code(
+                stages, normalized_expected, confidence_threshold,
+                seen=texts, matcher=matcher,
+                fuzzy=getattr(settings, 'OCR_FUZZY_ROOM_MATCH', True)
+            )
+
+            # Lưu tất cả text cho debugging
+            detected_text_list = [
+                {'text': text_item['text'], 'confidence': text_item['confidence']}
+                for text_item in texts
+            ]
+
+            detected_room_code = matched_item['text'] if matched_item else None
+            matched_box = matched_item['box'] if matched_item else None
+            matched_confidence = matched_item['confidence'] if matched_item else None
 
             is_matched = detected_room_code is not None
 
@@ -257,7 +514,10 @@ class OCRService:
                 'matched_confidence': matched_confidence,
                 'message': (
                     f"Room code matched: {detected_room_code}"
+                    + (" (fuzzy)" if match_distance else "")
                     if is_matched
+                    else f"Wrong room: detected {other_room_item['text']}. Expected: {expected_room_code}"
+                    if other_room_item
                     else f"Room code not found. Expected: {expected_room_code}"
                 )
             }
@@ -0,0 +1,131 @@
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+
+class RoomCodeMatcher:
+    """
+    So khớp gần đúng (edit distance ≤ 1) giữa text OCR và mã phòng.
+
+    Danh sách mã phòng (đã normalize) được biên dịch sẵn thành bảng
+    "xoá một ký tự" → mã phòng, nên mỗi lần tra chỉ sinh len(text) + 1 khoá
+    thay vì so Levenshtein với toàn bộ PhongHoc.
+
+    Text OCR chỉ được coi là khớp gần đúng với mã phòng dự kiến nếu không
+    có mã phòng nào khác gần nó bằng hoặc hơn (VD "A1101" sẽ không được
+    nhận là "A1102" khi phòng "A1101" tồn tại).
+
+    Args:
+        room_codes (iterable): Mã phòng đã normalize
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, room_codes: Iterable[str]):
+        self.room_codes: Set[str] = {code for code in room_codes if code}
+        lengths = [len(code) for code in self.room_codes] or [2, 8]
+        self._min_length, self._max_length = min(lengths) - 1, max(lengths) + 1
+        self._deletes: Dict[str, Set[str]] = {}
+        for code in self.room_codes:
+            for key in self._delete_variants(code):
+                self._deletes.setdefault(key, set()).add(code)
+
+    @staticmethod
+    def _delete_variants(text: str) -> Set[str]:
+        """text và mọi chuỗi thu được bằng cách xoá đúng một ký tự"""
+        variants = {text}
+        for i in range(len(text)):
+            variants.add(text[:i] + text[i + 1:])
+        return variants
+
+    @staticmethod
+    def _within_one_edit(a: str, b: str) -> bool:
+        """Levenshtein(a, b) ≤ 1 (thêm, xoá hoặc thay một ký tự)"""
+        if a == b:
+            return True
+        if abs(len(a) - len(b)) > 1:
+            return False
+        if len(a) > len(b):
+            a, b = b, a
+
+        i = 0
+        while i < len(a) and a[i] == b[i]:
+            i += 1
+        if len(a) == len(b):
+            return a[i + 1:] == b[i + 1:]
+        return a[i:] == b[i + 1:]
+
+    def candidates(self, text: str) -> Set[str]:
+        """Tất cả mã phòng cách text tối đa một phép sửa"""
+        found = set()
+        for key in self._delete_variants(text):
+            found |= self._deletes.get(key, set())
+        return {code for code in found if self._within_one_edit(text, code)}
+
+    def match(self, text: str, expected: str) -> Optional[int]:
+        """
+        So khớp text (đã normalize) với mã phòng dự kiến.
+
+        Returns:
+            int: 0 nếu khớp chính xác, 1 nếu khớp gần đúng,
+                None nếu không khớp hoặc mơ hồ với mã phòng khác
+        """
+        if not text or not expected:
+            return None
+        if text == expected:
+            return 0
+        if text in self.room_codes:
+            # Đọc đúng mã của một phòng khác
+            return None
+        if not self._within_one_edit(text, expected):
+            return None
+
+        others = self.candidates(text) - {expected}
+        return None if others else 1
+
+    def is_other_room(self, text: str, expected: str) -> bool:
+        """text (đã normalize) là mã của một phòng khác trong PhongHoc"""
+        return text != expected and text in self.room_codes
+
+    def likeness(self, text: str, expected: str) -> Optional[int]:
+        """
+        Mức giống mã phòng của text (đã normalize), dùng để chọn vùng crop OCR.
+
+        Returns:
+            int: 0 nếu cách mã phòng dự kiến tối đa một phép sửa, 1 nếu cách
+                một mã phòng khác tối đa một phép sửa, 2 nếu chỉ có dạng mã
+                phòng (độ dài tương tự, có chữ số); None nếu không giống
+        """
+        if not text:
+            return None
+        if expected and self._within_one_edit(text, expected):
+            return 0
+        if self.candidates(text):
+            return 1
+        if self._min_length <= len(text) <= self._max_length and any(c.isdigit() for c in text):
+            return 2
+        return None
+
+    @classmethod
+    def get(cls, normalize: Callable[[str], str]) -> 'RoomCodeMatcher':
+        """
+        Singleton matcher biên dịch từ PhongHoc.room_code.
+
+        Args:
+            normalize (callable): Hàm normalize mã phòng (OCRService._normalize_text)
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    from apps.my_built_in.models.phong_hoc import PhongHoc
+
+                    codes = PhongHoc.objects.exclude(room_code__isnull=True) \
+                        .values_list('room_code', flat=True)
+                    cls._instance = cls(normalize(code) for code in codes)
+        return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """Bỏ matcher hiện tại, lần gọi get() sau sẽ đọc lại PhongHoc"""
+        with cls._lock:
+            cls._instance = None
@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from apps.admins.services.core.ann_index import IVFIndex
+
+
+def unit_vectors(n, dim=512, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class IVFIndexBuildTests(unittest.TestCase):
+
+    def assert_round_trip(self, index):
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            loaded = IVFIndex.load(directory)
+            self.assertEqual(len(loaded), len(index))
+            self.assertEqual(loaded.nlist, index.nlist)
+
+    def test_empty(self):
+        index = IVFIndex.build(np.empty(0, dtype=np.int64), np.empty((0, 512), dtype=np.float32))
+
+        self.assertEqual(len(index), 0)
+        distances, ids = index.search(unit_vectors(1)[0], 5)
+        self.assertEqual(len(distances), 0)
+        self.assertEqual(len(ids), 0)
+        self.assert_round_trip(index)
+
+    def test_single_vector(self):
+        vectors = unit_vectors(1)
+        index = IVFIndex.build([42], vectors)
+
+        self.assertEqual(index.nlist, 1)
+        distances, ids = index.search(vectors[0], 5)
+        self.assertEqual(ids.tolist(), [42])
+        self.assertAlmostEqual(float(distances[0]), 0.0, places=3)
+        self.assert_round_trip(index)
+
+    def test_single_list(self):
+        vectors = unit_vectors(20)
+        index = IVFIndex.build(np.arange(20), vectors, nlist=1)
+
+        self.assertEqual(index.nlist, 1)
+        distances, ids = index.search(vectors[7], 3)
+        self.assertEqual(ids[0], 7)
+        self.assertEqual(len(ids), 3)
+        self.assert_round_trip(index)
+
+    def test_float16_storage(self):
+        vectors = unit_vectors(200)
+        index = IVFIndex.build(np.arange(200), vectors, nlist=8, dtype=np.float16)
+
+        self.assertEqual(index.vectors.dtype, np.float16)
+        _, ids = index.search(vectors[123], 1, nprobe=8)
+        self.assertEqual(ids.tolist(), [123])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,8 +15,10 @@ from apps.admins.serializers.attendance import (
     AttendanceUpdateSerializer
 )
 
+from apps.admins.services.attendance_frame import AttendanceFrame
+from apps.admins.services.attendance_pipeline import AttendancePipeline
+from apps.admins.services.course_gallery_cache import CourseGalleryCache
 from apps.admins.services.face_embedding_service import FaceEmbeddingService
-from apps.admins.services.ocr_service import OCRService
 from apps.admins.services.visualization_service import VisualizationService
 from apps.admins.services.image_metadata_service import ImageMetadataService
 from apps.my_built_in.response import ResponseFormat
@@ -72,12 +74,22 @@ class AttendanceWithValidationView(APIView):
             ).get(id=time_slot_id)
             
             course = time_slot.course
+
+            # Decode ảnh đúng một lần, dùng chung cho OCR, khuôn mặt,
+            # metadata và visualization
+            try:
+                frame = AttendanceFrame.from_file(image_file)
+            except ValueError as e:
+                return ResponseFormat.response(
+                    data={'message': str(e)},
+                    case_name="INVALID_INPUT"
+                )
             
             # ========== VALIDATE IMAGE TIMESTAMP ==========
             # Kiểm tra thời gian chụp ảnh có hợp lệ không
             # timestamp_validation = (
             #     ImageMetadataService.validate_image_timestamp(
-            #         image_file=image_file,
+            #         image_file=frame,
             #         lesson_date=time_slot.date,
             #         start_period=course.start_period,
             #         tolerance_minutes=30  # Cho phép chụp trước/sau 30 phút
@@ -110,8 +122,6 @@ class AttendanceWithValidationView(APIView):
             #         case_name="INVALID_INPUT"
             #     )
             
-            # Reset file pointer
-            image_file.seek(0)
             # ========== OCR VALIDATION ==========
             # Lấy mã phòng từ database
             if not course.room:
@@ -127,10 +137,11 @@ class AttendanceWithValidationView(APIView):
 
             expected_room_code = course.room.room_code
 
-            # Validate mã phòng từ ảnh so với database
-            ocr_result = OCRService.validate_room_code_with_database(
+            # Validate mã phòng từ ảnh so với database, đồng thời
+            # extract khuôn mặt (song song nếu bật ATTENDANCE_PARALLEL_PIPELINE)
+            ocr_result, extraction_result = AttendancePipeline.run(
+                frame=frame,
                 expected_room_code=expected_room_code,
-                image_file=image_file,
                 confidence_threshold=0.5
             )
             print("ocr_result", ocr_result)
@@ -145,9 +156,6 @@ class AttendanceWithValidationView(APIView):
                     },
                     case_name="INVALID_INPUT"
                 )
-            # Reset file pointer sau khi OCR
-            image_file.seek(0)
-
             if not ocr_result['is_valid']:
                 return ResponseFormat.response(
                     data={
@@ -162,16 +170,6 @@ class AttendanceWithValidationView(APIView):
             room_confidence = ocr_result.get('matched_confidence', 0.0)
 
             # ==================== EXTRACT FACES ====================
-            # Extract khuôn mặt từ ảnh
-            extraction_result = (
-                FaceEmbeddingService.extract_face_boxes_with_details(
-                    image_file=image_file
-                )
-            )
-
-            # Reset file pointer
-            image_file.seek(0)
-
             if not extraction_result['success']:
                 return ResponseFormat.response(
                     data={
@@ -186,38 +184,19 @@ class AttendanceWithValidationView(APIView):
             detected_vectors = [face['vector'] for face in detected_faces]
 
             # ==================== GET STUDENTS ====================
-            # Lấy danh sách sinh viên đã đăng ký lớp
-            enrollments = DangKy.objects.filter(
-                course=course,
-                is_deleted=False
-            ).select_related('student', 'student__user')
+            # Embedding của sinh viên đã đăng ký lớp (cache theo lớp,
+            # invalidate khi DangKy/SinhVien/TaiKhoan thay đổi)
+            gallery = CourseGalleryCache.get_gallery(course.id)
 
-            if not enrollments.exists():
+            if not gallery.enrollment_count:
                 return ResponseFormat.response(
                     data={'message': 'Không có sinh viên nào đăng ký lớp này'},
                     case_name="INVALID_INPUT"
                 )
 
-            # Tạo dict {student_id: vector_embedding}
-            student_vectors = {}
-            student_info = {}
-
-            for enrollment in enrollments:
-                student = enrollment.student
-                if student.user and student.user.vector_embedding:
-                    student_vectors[student.id] = student.user.vector_embedding
-                    student_info[student.id] = {
-                        'enrollment_id': enrollment.id,
-                        'student_id': student.id,
-                        'student_code': student.student_code,
-                        'full_name': (
-                            f"{student.user.first_name} "
-                            f"{student.user.last_name}"
-                        ),
-                        'email': student.user.email
-                    }
+            student_info = gallery.student_info
 
-            if not student_vectors:
+            if not student_info:
                 return ResponseFormat.response(
                     data={
                         'message': (
@@ -229,9 +208,9 @@ class AttendanceWithValidationView(APIView):
 
             # ==================== MATCH FACES ====================
             # So sánh các khuôn mặt với sinh viên
-            match_result = FaceEmbeddingService.match_faces_batch(
+            match_result = FaceEmbeddingService.match_faces_gallery(
                 detected_vectors=detected_vectors,
-                stored_vectors_dict=student_vectors,
+                gallery=gallery,
                 threshold=threshold
             )
 
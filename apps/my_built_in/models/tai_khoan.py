@@ -57,6 +57,10 @@ class TaiKhoan(AbstractBaseUser):
     # Tăng kích thước để chứa vector 512 chiều (dạng JSON string)
     # Vector 512 chiều khi convert sang JSON string ~4000-5000 ký tự
     vector_embedding = models.TextField(null=True, blank=True)
+    # Vector 512 chiều dạng nhị phân (float32 = 2 KB, float16 = 1 KB),
+    # encode/decode bằng FaceEmbeddingService.vector_to_bytes / bytes_to_vector.
+    # Chuyển dữ liệu JSON cũ: python manage.py convert_embeddings_to_binary
+    vector_embedding_bin = models.BinaryField(null=True, blank=True)
 
     role = models.CharField(max_length=20, null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -71,5 +75,30 @@ class TaiKhoan(AbstractBaseUser):
     class Meta:
         db_table = "tai_khoan"
 
+    # Field quyết định vector của tài khoản trong CampusFaceIndex
+    FACE_INDEX_FIELDS = {'vector_embedding', 'vector_embedding_bin', 'is_active'}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Trạng thái lúc đọc: signal CampusFaceIndex bỏ qua save không đổi embedding
+        if not cls.FACE_INDEX_FIELDS & instance.get_deferred_fields():
+            instance._saved_face_index_embedding = instance.face_index_embedding()
+        return instance
+
+    @property
+    def face_embedding(self):
+        """Embedding đã lưu: ưu tiên cột nhị phân, fallback JSON cũ"""
+        return self.vector_embedding_bin or self.vector_embedding
+
+    def face_index_embedding(self):
+        """Embedding của tài khoản trong CampusFaceIndex, None nếu chưa có hoặc đã khoá"""
+        if not self.is_active:
+            return None
+        embedding = self.face_embedding
+        if isinstance(embedding, memoryview):
+            embedding = embedding.tobytes()
+        return embedding or None
+
     def __str__(self):
         return f"{self.email} - {self.first_name} {self.last_name}"
\ No newline at end of file
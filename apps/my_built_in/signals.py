@@ -1,6 +1,26 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from apps.my_built_in.models import BuoiHoc, DangKy, ThamDu
+from apps.my_built_in.models import BuoiHoc, DangKy, SinhVien, TaiKhoan, ThamDu
+from apps.my_built_in.models.phong_hoc import PhongHoc
+from apps.admins.services.course_gallery_cache import CourseGalleryCache
+from apps.admins.services.room_code_matcher import RoomCodeMatcher
+
+# Field của TaiKhoan có trong CourseGallery / CampusFaceIndex
+EMBEDDING_USER_FIELDS = {'vector_embedding', 'vector_embedding_bin'}
+GALLERY_USER_FIELDS = EMBEDDING_USER_FIELDS | {'first_name', 'last_name', 'email'}
+# Trạng thái index của tài khoản chưa biết (không đọc đủ field từ DB)
+_UNKNOWN = object()
+
+
+def _invalidate_course_galleries_on_commit(course_ids):
+    """
+    Bỏ gallery các lớp sau khi transaction commit: invalidate trong
+    transaction thì request khác có thể đọc lại DB cũ và cache gallery
+    cũ tới hết COURSE_GALLERY_CACHE_TTL.
+    """
+    course_ids = list(course_ids)
+    transaction.on_commit(lambda: CourseGalleryCache.invalidate_courses(course_ids))
 
 
 @receiver(post_save, sender=BuoiHoc)
@@ -29,3 +49,82 @@ def create_attendance_records(sender, instance, created, **kwargs):
         
         # Bulk create để tối ưu performance
         ThamDu.objects.bulk_create(attendance_records, ignore_conflicts=True)
+
+
+@receiver(post_save, sender=PhongHoc)
+@receiver(post_delete, sender=PhongHoc)
+def invalidate_room_code_matcher(sender, instance, **kwargs):
+    """
+    Danh sách mã phòng thay đổi: bỏ RoomCodeMatcher đã biên dịch,
+    lần validate OCR sau sẽ đọc lại PhongHoc.
+    """
+    RoomCodeMatcher.invalidate()
+
+
+@receiver(post_save, sender=DangKy)
+@receiver(post_delete, sender=DangKy)
+def invalidate_course_gallery_on_enrollment(sender, instance, **kwargs):
+    """Đăng ký lớp thay đổi: bỏ gallery embedding của lớp đó"""
+    _invalidate_course_galleries_on_commit([instance.course_id])
+
+
+@receiver(post_save, sender=SinhVien)
+def invalidate_course_gallery_on_student(sender, instance, **kwargs):
+    """Sinh viên thay đổi (mã SV, tài khoản): bỏ gallery các lớp đã đăng ký"""
+    _invalidate_course_galleries_on_commit(
+        DangKy.objects.filter(student=instance).values_list('course_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=TaiKhoan)
+def invalidate_course_gallery_on_user(sender, instance, update_fields=None, **kwargs):
+    """
+    Embedding (ảnh đại diện) hoặc thông tin hiển thị thay đổi: bỏ gallery
+    các lớp sinh viên đã đăng ký. Bỏ qua save chỉ ghi field khác
+    (VD last_login khi đăng nhập).
+    """
+    if update_fields is not None and not GALLERY_USER_FIELDS & set(update_fields):
+        return
+    _invalidate_course_galleries_on_commit(
+        DangKy.objects.filter(student__user=instance).values_list('course_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=TaiKhoan)
+def update_campus_face_index(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Tạo tài khoản có embedding, đổi ảnh đại diện hoặc khoá/mở tài khoản:
+    cập nhật index khuôn mặt toàn trường. Bỏ qua save không đổi embedding
+    so với lần đọc/lưu trước (sửa thông tin cá nhân, tài khoản không có
+    ảnh, create_user rồi save lại).
+    """
+    if update_fields is not None and not TaiKhoan.FACE_INDEX_FIELDS & set(update_fields):
+        return
+
+    previous = None if created else getattr(instance, '_saved_face_index_embedding', _UNKNOWN)
+    embedding = instance.face_index_embedding()
+    instance._saved_face_index_embedding = embedding
+    if embedding == previous:
+        return
+
+    # Import muộn: không load torch khi Django khởi động
+    from apps.admins.services.face_embedding_service import FaceEmbeddingService
+    from apps.admins.services.face_index import CampusFaceIndex
+
+    # Ghi delta.log sau khi commit: tài khoản bị rollback không để lại
+    # vector ma trong index của mọi worker
+    user_id = instance.id
+    vector = FaceEmbeddingService.string_to_vector(embedding) if embedding is not None else None
+    transaction.on_commit(lambda: CampusFaceIndex.get().update(user_id, vector))
+
+
+@receiver(post_delete, sender=TaiKhoan)
+def remove_from_campus_face_index(sender, instance, **kwargs):
+    """Xoá tài khoản: bỏ khỏi index khuôn mặt nếu có thể đã được index"""
+    if getattr(instance, '_saved_face_index_embedding', _UNKNOWN) is None:
+        return
+
+    from apps.admins.services.face_index import CampusFaceIndex
+
+    user_id = instance.id
+    transaction.on_commit(lambda: CampusFaceIndex.get().remove(user_id))
@@ -8,13 +8,11 @@ from apps.my_built_in.response import ResponseFormat
 from apps.my_built_in.models import SinhVien, BuoiHoc, DangKy, ThamDu
 from django.core.files.storage import default_storage
 from datetime import datetime
+from apps.admins.services.attendance_frame import AttendanceFrame
+from apps.admins.services.attendance_pipeline import AttendancePipeline
+from apps.admins.services.course_gallery_cache import CourseGalleryCache
 from apps.admins.services.face_embedding_service import FaceEmbeddingService
-from apps.admins.services.ocr_service import OCRService
 from apps.admins.services.visualization_service import VisualizationService
-from PIL import Image
-from io import BytesIO
-import cv2
-import numpy as np
 import json
 import os
 
@@ -87,11 +85,22 @@ class StudentUploadAttendanceImageView(APIView):
                 )
             
             expected_room_code = course.room.room_code
+
+            # Decode ảnh đúng một lần, dùng chung cho OCR, khuôn mặt,
+            # visualization và lưu file
+            try:
+                frame = AttendanceFrame.from_file(image_file)
+            except ValueError as e:
+                return ResponseFormat.response(
+                    data={'message': str(e)},
+                    case_name="INVALID_INPUT"
+                )
             
-            # Validate mã phòng từ ảnh
-            ocr_result = OCRService.validate_room_code_with_database(
+            # Validate mã phòng từ ảnh, đồng thời extract khuôn mặt
+            # (song song nếu bật ATTENDANCE_PARALLEL_PIPELINE)
+            ocr_result, extraction_result = AttendancePipeline.run(
+                frame=frame,
                 expected_room_code=expected_room_code,
-                image_file=image_file,
                 confidence_threshold=0.5
             )
             
@@ -103,9 +112,6 @@ class StudentUploadAttendanceImageView(APIView):
                     case_name="INVALID_INPUT"
                 )
             
-            # Reset file pointer sau OCR
-            image_file.seek(0)
-            
             detected_room_code = ocr_result['detected_room_code']
             room_box = ocr_result.get('matched_box')
             
@@ -114,26 +120,10 @@ class StudentUploadAttendanceImageView(APIView):
             filename = f"attendance_{time_slot_id}_{timestamp}{os.path.splitext(image_file.name)[1]}"
             file_path = f"attendance_uploads/{filename}"
             
-            saved_path = default_storage.save(file_path, image_file)
+            saved_path = default_storage.save(file_path, frame.to_content_file())
             image_url = saved_path  # Lưu đường dẫn tương đối
             
-            # Reset file pointer để đọc lại ảnh cho face recognition
-            image_file.seek(0)
-            
             # ========== NHẬN DIỆN KHUÔN MẶT ==========
-            # Đọc ảnh
-            img = Image.open(image_file)
-            img_rgb = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            img_byte_arr = BytesIO()
-            img_pil = Image.fromarray(cv2.cvtColor(img_rgb, cv2.COLOR_BGR2RGB))
-            img_pil.save(img_byte_arr, format='JPEG')
-            img_byte_arr.seek(0)
-            
-            # Extract faces
-            extraction_result = FaceEmbeddingService.extract_face_boxes_with_details(
-                image_file=img_byte_arr
-            )
-            
             if not extraction_result['success']:
                 # Xóa file vừa upload nếu không detect được khuôn mặt
                 default_storage.delete(saved_path)
@@ -147,28 +137,11 @@ class StudentUploadAttendanceImageView(APIView):
             detected_faces = extraction_result['faces']
             detected_vectors = [face['vector'] for face in detected_faces]
             
-            # Lấy danh sách sinh viên đã đăng ký lớp
-            enrollments = DangKy.objects.filter(
-                course=time_slot.course,
-                is_deleted=False
-            ).select_related('student__user')
-            
-            # Tạo dict student vectors
-            student_vectors = {}
-            student_info = {}
-            
-            for enrollment in enrollments:
-                student_obj = enrollment.student
-                # Face embedding nằm trong TaiKhoan (user), không phải SinhVien
-                if student_obj.user and student_obj.user.vector_embedding:
-                    # Lưu vector_str (JSON string), KHÔNG parse
-                    student_vectors[student_obj.id] = student_obj.user.vector_embedding
-                    student_info[student_obj.id] = {
-                        'student_id': student_obj.id,
-                        'student_code': student_obj.student_code,
-                        'enrollment_id': enrollment.id
-                    }
-            if not student_vectors:
+            # Embedding của sinh viên đã đăng ký lớp (cache theo lớp)
+            gallery = CourseGalleryCache.get_gallery(time_slot.course_id)
+            student_info = gallery.student_info
+
+            if not student_info:
                 default_storage.delete(saved_path)
                 return ResponseFormat.response(
                     data={'message': 'Không có sinh viên nào có face embedding trong lớp'},
@@ -176,9 +149,9 @@ class StudentUploadAttendanceImageView(APIView):
                 )
             
             # Match faces với threshold = 0.95
-            match_result = FaceEmbeddingService.match_faces_batch(
+            match_result = FaceEmbeddingService.match_faces_gallery(
                 detected_vectors=detected_vectors,
-                stored_vectors_dict=student_vectors,
+                gallery=gallery,
                 threshold=0.95
             )
             
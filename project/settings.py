@@ -238,4 +238,120 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
-}
\ No newline at end of file
+}
+
+
+# Face detection
+# Ảnh upload lớn (VD: 4000x3000 từ điện thoại) được thu nhỏ về cạnh dài tối đa
+# FACE_DETECTION_MAX_SIZE trước khi chạy RetinaFace, rồi pad lên bội số của
+# FACE_DETECTION_SIZE_BUCKET để các độ phân giải gần nhau dùng chung prior box.
+# Đặt FACE_DETECTION_MAX_SIZE=0 để chạy trên ảnh gốc.
+FACE_DETECTION_MAX_SIZE = int(os.getenv('FACE_DETECTION_MAX_SIZE', 1280))
+FACE_DETECTION_SIZE_BUCKET = int(os.getenv('FACE_DETECTION_SIZE_BUCKET', 32))
+
+# Attendance pipeline
+# Chạy OCR mã phòng và trích xuất khuôn mặt song song trên thread pool
+ATTENDANCE_PARALLEL_PIPELINE = os.getenv('ATTENDANCE_PARALLEL_PIPELINE', 'true').lower() == 'true'
+ATTENDANCE_PIPELINE_WORKERS = int(os.getenv('ATTENDANCE_PIPELINE_WORKERS', 4))
+
+# OCR mã phòng
+# Hai bước: OCR ảnh thu nhỏ (cạnh dài OCR_PREVIEW_MAX_SIZE) để tìm vùng text,
+# sau đó OCR độ phân giải gốc trên OCR_CROP_CANDIDATES vùng giống mã phòng nhất.
+# Dừng ngay khi một crop đọc được mã của phòng khác (ảnh chụp sai phòng).
+# Ảnh thu nhỏ không có vùng nào giống mã phòng: OCR toàn ảnh gốc như cũ.
+# OCR_FULL_FRAME_FALLBACK: cũng OCR toàn ảnh gốc khi các crop không đọc
+# được text nào giống mã phòng.
+OCR_TWO_STAGE = os.getenv('OCR_TWO_STAGE', 'true').lower() == 'true'
+OCR_PREVIEW_MAX_SIZE = int(os.getenv('OCR_PREVIEW_MAX_SIZE', 1280))
+OCR_CROP_CANDIDATES = int(os.getenv('OCR_CROP_CANDIDATES', 3))
+OCR_FULL_FRAME_FALLBACK = os.getenv('OCR_FULL_FRAME_FALLBACK', 'true').lower() == 'true'
+# Chấp nhận text OCR cách mã phòng một ký tự (thêm/xoá/sai) nếu không
+# trùng hoặc gần hơn với mã của phòng khác
+OCR_FUZZY_ROOM_MATCH = os.getenv('OCR_FUZZY_ROOM_MATCH', 'true').lower() == 'true'
+
+# Preload + warm-up model AI (PaddleOCR, RetinaFace, GhostFaceNet) khi worker
+# khởi động, chỉ áp dụng cho runserver và các server trong
+# MODEL_WARMUP_SERVER_ENTRYPOINTS (xem model_warmup.py).
+# Server chạy theo cách khác (mod_wsgi, script riêng): đặt MODEL_WARMUP_SERVER=true
+# trong môi trường của process server (không đặt trong .env dùng chung).
+# Có thể chạy tay: python manage.py warmup_models
+MODEL_WARMUP_ON_STARTUP = os.getenv('MODEL_WARMUP_ON_STARTUP', 'false').lower() == 'true'
+MODEL_WARMUP_SERVER = os.getenv('MODEL_WARMUP_SERVER', 'false').lower() == 'true'
+MODEL_WARMUP_SERVER_ENTRYPOINTS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi')
+MODEL_WARMUP_RESOLUTIONS = [(720, 1280), (1280, 720), (3000, 4000), (4000, 3000)]
+
+# Log INFO của các app (thời gian warm-up model, scheduler, ...)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'apps': {
+            'handlers': ['console'],
+            'level': os.getenv('APPS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Inference backend cho model AI
+# - 'local': mỗi worker tự load PaddleOCR, RetinaFace, GhostFaceNet
+# - 'server': worker gọi inference server dùng chung qua Unix socket
+#   (python manage.py run_inference_server)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'local')
+INFERENCE_SERVER_ADDRESS = os.getenv('INFERENCE_SERVER_ADDRESS', '/tmp/attendance-inference.sock')
+INFERENCE_SERVER_AUTHKEY = os.getenv('INFERENCE_SERVER_AUTHKEY', SECRET_KEY)
+# Micro-batching trên server: gom request trong tối đa MAX_WAIT_MS
+INFERENCE_SERVER_MAX_BATCH_IMAGES = int(os.getenv('INFERENCE_SERVER_MAX_BATCH_IMAGES', 8))
+INFERENCE_SERVER_MAX_BATCH_FACES = int(os.getenv('INFERENCE_SERVER_MAX_BATCH_FACES', 64))
+INFERENCE_SERVER_MAX_WAIT_MS = float(os.getenv('INFERENCE_SERVER_MAX_WAIT_MS', 5))
+
+# Gom khuôn mặt từ các request đồng thời trong một worker thành một forward
+# pass GhostFaceNet (tối đa batch_size khuôn mặt hoặc chờ MAX_WAIT_MS)
+FACE_RECOGNITION_MICRO_BATCH = os.getenv('FACE_RECOGNITION_MICRO_BATCH', 'false').lower() == 'true'
+FACE_RECOGNITION_MAX_WAIT_MS = float(os.getenv('FACE_RECOGNITION_MAX_WAIT_MS', 5))
+
+# Độ chính xác khi chạy GhostFaceNet: fp32 | fp16 (chỉ CUDA) | bf16 | int8 (chỉ CPU)
+# Kiểm tra sai lệch embedding so với fp32 trước khi đổi:
+#   python -m apps.admins.services.core.recognition.check_precision <thư mục ảnh>
+FACE_RECOGNITION_PRECISION = os.getenv('FACE_RECOGNITION_PRECISION', 'fp32')
+FACE_RECOGNITION_CHANNELS_LAST = os.getenv('FACE_RECOGNITION_CHANNELS_LAST', 'false').lower() == 'true'
+
+# INT8 trên CPU (RetinaFace backbone, GhostFaceNet khi PRECISION=int8)
+# Tạo cache: python manage.py quantize_face_models --calibration-dir <thư mục ảnh>
+# Đo tốc độ / sai lệch: python -m apps.admins.services.core.bench_quantization <thư mục ảnh>
+FACE_DETECTION_INT8 = os.getenv('FACE_DETECTION_INT8', 'false').lower() == 'true'
+QUANTIZATION_ENGINE = os.getenv('QUANTIZATION_ENGINE') or None
+
+# Backend chạy RetinaFace / GhostFaceNet: torch | torchscript | onnx (CPU)
+# torchscript / onnx cần export trước: python manage.py export_face_models
+FACE_MODEL_BACKEND = os.getenv('FACE_MODEL_BACKEND', 'torch')
+
+# Kiểu lưu embedding nhị phân (TaiKhoan.vector_embedding_bin): float32 (2 KB) | float16 (1 KB)
+# Chuyển dữ liệu JSON cũ: python manage.py convert_embeddings_to_binary
+FACE_EMBEDDING_DTYPE = os.getenv('FACE_EMBEDDING_DTYPE', 'float32')
+
+# Cache embedding theo lớp tín chỉ (ma trận (N, 512) dùng khi điểm danh)
+# SIZE: số lớp giữ trong mỗi worker (0 = tắt), TTL: giây (0 = không hết hạn)
+# SHARED=true: dùng CACHES['default'] (Redis/Memcached) để mọi worker
+# thấy invalidate ngay và dùng chung gallery đã đọc
+COURSE_GALLERY_CACHE_SIZE = int(os.getenv('COURSE_GALLERY_CACHE_SIZE', 64))
+COURSE_GALLERY_CACHE_TTL = float(os.getenv('COURSE_GALLERY_CACHE_TTL', 300))
+COURSE_GALLERY_CACHE_SHARED = os.getenv('COURSE_GALLERY_CACHE_SHARED', 'false').lower() == 'true'
+
+# Ghép khuôn mặt - sinh viên khi điểm danh: hungarian (tối ưu, cần scipy) | greedy
+# CANDIDATES: số ứng viên trả về cho mỗi khuôn mặt, AMBIGUITY_MARGIN: chênh
+# lệch khoảng cách dưới mức này với ứng viên thứ hai thì match bị đánh dấu ambiguous
+FACE_MATCH_ASSIGNMENT = os.getenv('FACE_MATCH_ASSIGNMENT', 'hungarian')
+FACE_MATCH_CANDIDATES = int(os.getenv('FACE_MATCH_CANDIDATES', 3))
+FACE_MATCH_AMBIGUITY_MARGIN = float(os.getenv('FACE_MATCH_AMBIGUITY_MARGIN', 0.05))
+
+# Index ANN (IVF) embedding khuôn mặt toàn trường cho FaceEmbeddingService.search
+# Build / gộp cập nhật: python manage.py build_face_index [--benchmark 1000]
+# NPROBE: số list quét mỗi lần search (tăng = chính xác hơn, chậm hơn)
+FACE_INDEX_DIR = os.getenv('FACE_INDEX_DIR') or os.path.join(BASE_DIR, 'face_index')
+FACE_INDEX_DTYPE = os.getenv('FACE_INDEX_DTYPE', 'float32')
+FACE_INDEX_NPROBE = int(os.getenv('FACE_INDEX_NPROBE', 32))